@@ -1,6 +1,32 @@
 import cv2
 import numpy as np
 
+
+def shape_vertices(shape_type, boxes):
+    """
+    Vertices of many shapes of one type at once, following make_shape's geometry.
+    :param shape_type: One of Perform.available_shapes().
+    :param boxes: Array of shape (N, 4) with startX, startY, endX, endY per shape.
+    :return: int32 array of shape (N, corners, 2).
+    """
+    boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+    startX, startY, endX, endY = boxes.T
+    if shape_type == 'square':
+        side_length = np.minimum(np.abs(endX - startX), np.abs(endY - startY))
+        endX, endY = startX + side_length, startY + side_length
+        shape_type = 'rectangle'
+    if shape_type == 'rectangle':
+        corners = [(startX, startY), (endX, startY), (endX, endY), (startX, endY)]
+    elif shape_type == 'triangle':
+        corners = [(startX, endY), ((startX + endX) // 2, startY), (endX, endY)]
+    elif shape_type == 'rhombus':
+        centerX, centerY = (startX + endX) // 2, (startY + endY) // 2
+        corners = [(centerX, startY), (startX, centerY), (centerX, endY), (endX, centerY)]
+    else:
+        raise ValueError("Unsupported shape type, Use rectangle, triangle, square, or rhombus.")
+    return np.stack([np.stack(corner, axis=-1) for corner in corners], axis=1).astype(np.int32)
+
+
 class Perform:
     def __init__(self, width, height):
         """
@@ -9,6 +35,10 @@ class Perform:
         :param height: Height of the canvas.
         """
         self.blank = np.zeros((height, width, 3), dtype=np.uint8)
+        # retained display list: (shape_type, color, thickness) -> {'ids', 'vertices', 'bounds'}
+        self.display_list = {}
+        self._next_id = 0
+        self._dirty = []
 
     @staticmethod
     def available_shapes():
@@ -135,6 +165,224 @@ class Perform:
         :return: Cropped region of the canvas.
         """
         return self.blank[startY:endY, startX:endX]
+
+    def add_shapes(self, boxes, shape_type, color=(255, 255, 255), thickness=2):
+        """
+        Add many shapes of one type to the display list, drawn on the next render().
+        :param boxes: Array of shape (N, 4) with startX, startY, endX, endY per shape.
+        :param shape_type: One of available_shapes().
+        :param color: One color for all shapes, or an array of shape (N, 3) with one color per shape.
+        :param thickness: Line thickness, -1 fills the shapes.
+        :return: Array of the ids given to the new shapes, for remove_shapes().
+        """
+        vertices = shape_vertices(shape_type, boxes)
+        ids = np.arange(self._next_id, self._next_id + len(vertices))
+        self._next_id += len(vertices)
+        colors = np.asarray(color, dtype=np.int32)
+        if colors.ndim == 1:
+            groups = [(tuple(colors.tolist()), slice(None))]
+        else:
+            unique_colors, inverse = np.unique(colors.reshape(-1, 3), axis=0, return_inverse=True)
+            groups = [(tuple(c.tolist()), inverse.ravel() == i) for i, c in enumerate(unique_colors)]
+        margin = thickness // 2 + 1 if thickness > 0 else 1
+        bounds = np.concatenate([vertices.min(axis=1) - margin, vertices.max(axis=1) + margin + 1], axis=1)
+        for group_color, selection in groups:
+            key = (shape_type, group_color, thickness)
+            group = self.display_list.get(key)
+            if group is None:
+                self.display_list[key] = {'ids': ids[selection], 'vertices': vertices[selection],
+                                          'bounds': bounds[selection]}
+            else:
+                group['ids'] = np.concatenate([group['ids'], ids[selection]])
+                group['vertices'] = np.concatenate([group['vertices'], vertices[selection]])
+                group['bounds'] = np.concatenate([group['bounds'], bounds[selection]])
+        self._mark_dirty(bounds)
+        return ids
+
+    def remove_shapes(self, ids):
+        """Remove shapes from the display list by id; their area is redrawn on the next render()."""
+        for key in list(self.display_list):
+            group = self.display_list[key]
+            removed = np.isin(group['ids'], ids)
+            if not removed.any():
+                continue
+            self._mark_dirty(group['bounds'][removed])
+            if removed.all():
+                del self.display_list[key]
+            else:
+                for name in ('ids', 'vertices', 'bounds'):
+                    group[name] = group[name][~removed]
+
+    def render(self, full=False):
+        """
+        Draw the display list onto the canvas.
+
+        Only the regions touched by add_shapes()/remove_shapes() since the last render are
+        cleared and redrawn, with one cv2.polylines call per outlined shape group and region
+        and one cv2.fillPoly call per filled shape. Anything drawn with make_shape()
+        inside those regions is cleared too.
+        :param full: Clear and redraw the whole canvas.
+        :return: The canvas.
+        """
+        height, width = self.blank.shape[:2]
+        if full:
+            regions = [(0, 0, width, height)]
+        else:
+            regions = self._dirty_regions(width, height)
+        self._dirty = []
+        for x0, y0, x1, y1 in regions:
+            visible = {}
+            left, top, right, bottom = x0, y0, x1, y1
+            for key, group in self.display_list.items():
+                bounds = group['bounds']
+                mask = (bounds[:, 0] < x1) & (bounds[:, 2] > x0) & (bounds[:, 1] < y1) & (bounds[:, 3] > y0)
+                if mask.any():
+                    visible[key] = mask
+                    left, top = min(left, bounds[mask, 0].min()), min(top, bounds[mask, 1].min())
+                    right, bottom = max(right, bounds[mask, 2].max()), max(bottom, bounds[mask, 3].max())
+            # Draw into a scratch area that holds the visible shapes entirely: OpenCV rasterizes
+            # shapes clipped at the top/left border differently, so drawing straight into the
+            # dirty region would not give the same pixels as a full redraw.
+            left, top = max(int(left), 0), max(int(top), 0)
+            right, bottom = min(int(right), width), min(int(bottom), height)
+            scratch = np.zeros((bottom - top, right - left, 3), dtype=np.uint8)
+            origin = np.array([left, top], dtype=np.int32)
+            for key, mask in visible.items():
+                shape_type, color, thickness = key
+                pts = self.display_list[key]['vertices'][mask] - origin
+                if thickness < 0:
+                    # fillPoly treats several contours as one even-odd polygon, so overlaps
+                    # would come out as holes: fill the shapes one by one
+                    for shape in pts:
+                        cv2.fillPoly(scratch, [shape], color)
+                else:
+                    cv2.polylines(scratch, pts, isClosed=True, color=color, thickness=thickness)
+            self.blank[y0:y1, x0:x1] = scratch[y0 - top:y1 - top, x0 - left:x1 - left]
+        return self.blank
+
+    def transform_stack(self):
+        """
+        Start a chain of transforms that is applied with a single warp, see TransformStack.
+        """
+        return TransformStack(self)
+
+    def _mark_dirty(self, bounds):
+        if len(bounds):
+            self._dirty.append(np.concatenate([bounds[:, :2].min(axis=0), bounds[:, 2:].max(axis=0)]))
+
+    def _dirty_regions(self, width, height, max_regions=16):
+        regions = np.array(self._dirty, dtype=np.int64).reshape(-1, 4)
+        if len(regions) > max_regions:
+            # many small edits: one bounding region is cheaper than many passes over the groups
+            regions = np.concatenate([regions[:, :2].min(axis=0), regions[:, 2:].max(axis=0)])[None]
+        regions = np.clip(regions, 0, [width, height, width, height])
+        return [tuple(r) for r in regions.tolist() if r[2] > r[0] and r[3] > r[1]]
+
+
+class TransformStack:
+    """
+    Composes translate/scale/rotate/shear/reflect/crop into one 2x3 affine matrix.
+
+    Every call multiplies its matrix onto the stack instead of resampling the canvas, so
+    apply() costs a single cv2.warpAffine however long the chain is and the result is
+    resampled (and blurred) only once. Each step works like the matching Perform method on
+    the output of the previous steps; crop() only changes the output size. When the chain
+    reduces to an integer translation (e.g. crops and translations only) apply() copies
+    pixels instead of warping. redraw() transforms the display list vertices instead and
+    draws them again, which keeps lines sharp.
+
+    Example:
+        canvas.transform_stack().rotate(45).scale(1.5, 1.5).translate(10, 0).crop(0, 0, 300, 300).apply()
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.matrix = np.eye(3)
+        self.width, self.height = canvas.blank.shape[1], canvas.blank.shape[0]
+
+    def _push(self, M):
+        self.matrix = np.vstack([M, [0, 0, 1]]) @ self.matrix
+        return self
+
+    def _center(self):
+        return (self.width // 2, self.height // 2)
+
+    def translate(self, tx, ty):
+        return self._push(np.float64([[1, 0, tx], [0, 1, ty]]))
+
+    def scale(self, scale_x, scale_y):
+        """Scale around the center of the current output."""
+        cx, cy = self._center()
+        return self._push(np.float64([[scale_x, 0, cx * (1 - scale_x)], [0, scale_y, cy * (1 - scale_y)]]))
+
+    def rotate(self, angle):
+        """Rotate around the center of the current output."""
+        return self._push(cv2.getRotationMatrix2D(self._center(), angle, 1))
+
+    def shear(self, shear_x, shear_y):
+        return self._push(np.float64([[1, shear_x, 0], [shear_y, 1, 0]]))
+
+    def reflect(self, axis='horizontal'):
+        if axis == 'horizontal':
+            return self._push(np.float64([[-1, 0, self.width - 1], [0, 1, 0]]))
+        if axis == 'vertical':
+            return self._push(np.float64([[1, 0, 0], [0, -1, self.height - 1]]))
+        raise ValueError("Axis must be either 'horizontal' or 'vertical'.")
+
+    def crop(self, startX, startY, endX, endY):
+        """Keep only the given region of the current output."""
+        startX, startY = max(startX, 0), max(startY, 0)
+        endX, endY = min(endX, self.width), min(endY, self.height)
+        self.width, self.height = endX - startX, endY - startY
+        return self._push(np.float64([[1, 0, -startX], [0, 1, -startY]]))
+
+    def affine(self):
+        """The composed 2x3 matrix."""
+        return self.matrix[:2].copy()
+
+    def apply(self, interpolation=cv2.INTER_LINEAR):
+        """
+        Resample the canvas once with the composed matrix.
+        :return: New image of the final output size, the canvas itself is not modified.
+        """
+        M = self.affine()
+        linear, offset = M[:, :2], M[:, 2]
+        if np.array_equal(linear, np.eye(2)) and np.array_equal(offset, np.round(offset)):
+            return self._shifted_copy(int(offset[0]), int(offset[1]))
+        return cv2.warpAffine(self.canvas.blank, M, (self.width, self.height), flags=interpolation)
+
+    def redraw(self):
+        """
+        Transform the display list vertices and draw them on a new canvas of the output size.
+        :return: New Perform holding the transformed display list, already rendered.
+        """
+        M = self.affine()
+        result = Perform(self.width, self.height)
+        for (shape_type, color, thickness), group in self.canvas.display_list.items():
+            vertices = group['vertices']
+            moved = cv2.transform(vertices.reshape(-1, 1, 2).astype(np.float64), M)
+            moved = np.round(moved).astype(np.int32).reshape(vertices.shape)
+            margin = thickness // 2 + 1 if thickness > 0 else 1
+            result.display_list[(shape_type, color, thickness)] = {
+                'ids': group['ids'].copy(),
+                'vertices': moved,
+                'bounds': np.concatenate([moved.min(axis=1) - margin, moved.max(axis=1) + margin + 1], axis=1),
+            }
+        result._next_id = self.canvas._next_id
+        result.render(full=True)
+        return result
+
+    def _shifted_copy(self, tx, ty):
+        src = self.canvas.blank
+        out = np.zeros((self.height, self.width) + src.shape[2:], dtype=src.dtype)
+        # destination pixel (x, y) comes from source pixel (x - tx, y - ty)
+        x0, y0 = max(tx, 0), max(ty, 0)
+        x1, y1 = min(self.width, src.shape[1] + tx), min(self.height, src.shape[0] + ty)
+        if x1 > x0 and y1 > y0:
+            out[y0:y1, x0:x1] = src[y0 - ty:y1 - ty, x0 - tx:x1 - tx]
+        return out
+
+
 if __name__ == '__main__':
     blank_width, blank_height = 500, 500
 
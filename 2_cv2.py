@@ -1,24 +1,103 @@
+import glob
+import logging
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
 import cv2
 import numpy as np
 
+import image_cache
+from image_writer import encoder_params
+from instrumentation import instrumented
+
+logger = logging.getLogger(__name__)
+
+# operations that may be chained in process_batch, applied in the given order
+BATCH_OPERATIONS = ('resize_to_dimensions', 'resize_by_scale', 'blur_image')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp')
+INTERPOLATION_METHODS = {
+    'linear': cv2.INTER_LINEAR,
+    'nearest': cv2.INTER_NEAREST,
+    'polynomial': cv2.INTER_CUBIC,
+    'area': cv2.INTER_AREA,
+}
+# 'auto' lets plan_resize pick pyramid stages and the interpolation from the scale factor
+RESIZE_METHODS = tuple(INTERPOLATION_METHODS) + ('auto',)
+REDUCED_READ_FLAGS = {
+    # factor -> (color, grayscale) flags; JPEG decodes these with DCT scaling
+    8: (cv2.IMREAD_REDUCED_COLOR_8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+    4: (cv2.IMREAD_REDUCED_COLOR_4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+    2: (cv2.IMREAD_REDUCED_COLOR_2, cv2.IMREAD_REDUCED_GRAYSCALE_2),
+}
+# blur type -> label; the last four cost the same per pixel whatever the kernel size
+BLUR_TYPES = {
+    'box': 'Box',
+    'gaussian': 'Gaussian',
+    'adaptive': 'Adaptive',
+    'box_integral': 'Integral Box',
+    'gaussian_stacked': 'Stacked Box Gaussian',
+    'gaussian_iir': 'Recursive Gaussian',
+    'gaussian_pyramid': 'Pyramid Gaussian',
+}
+
 class ImageProcessor:
-    def __init__(self, IMG_PATH):
+    def __init__(self, IMG_PATH, use_cache=True):
+        """
+        :param IMG_PATH: Path of the image to load.
+        :param use_cache: Share the decoded image with other readers of the same file
+            (see image_cache); the shared array is read-only.
+        """
         self.IMG_PATH = IMG_PATH
-        self.img = cv2.imread(IMG_PATH)
+        self.img = image_cache.imread(IMG_PATH) if use_cache else cv2.imread(IMG_PATH)
         if self.img is None:
             raise FileNotFoundError("No image was found")
 
+    @classmethod
+    def from_array(cls, img, IMG_PATH=None):
+        """Create a processor around an already decoded image (no file access)."""
+        processor = cls.__new__(cls)
+        processor.IMG_PATH = IMG_PATH
+        processor.img = img
+        return processor
+
+    @classmethod
+    def thumbnail(cls, IMG_PATH, width, height):
+        """
+        Load an image straight at a small target size.
+
+        When the target is at least 2x smaller than the file, the image is decoded at
+        reduced resolution (JPEG DCT scaling), then shrunk with plan_resize, so a
+        thumbnail costs a fraction of a full decode.
+
+        :param IMG_PATH: Path of the image.
+        :param width: Width of the thumbnail.
+        :param height: Height of the thumbnail.
+        """
+        img = None
+        src_size = read_image_size(IMG_PATH)
+        if src_size is not None:
+            flags = reduced_read_flags(src_size, (width, height))
+            if flags is not None:
+                img = cv2.imread(IMG_PATH, flags)
+                # EXIF rotation can swap the axes, fall back to a full decode if it came out too small
+                if img is not None and (img.shape[1] < width or img.shape[0] < height):
+                    img = None
+        if img is None:
+            img = cv2.imread(IMG_PATH)
+        if img is None:
+            raise FileNotFoundError("No image was found")
+        return cls.from_array(resize_planned(img, (width, height)), IMG_PATH)
+
     @staticmethod
     def method_to_resize():
-        methods = {
-            'linear': cv2.INTER_LINEAR,
-            'nearest': cv2.INTER_NEAREST,
-            'polynomial': cv2.INTER_CUBIC,
-        }
+        methods = INTERPOLATION_METHODS
         print("Available interpolation methods:")
         for key, value in methods.items():
             print(f"  - {key.capitalize()}: OpenCV code {value}")
+        print("  - Auto: pyramid stages plus area/linear/cubic chosen from the scale factor")
 
+    @instrumented(state='img')
     def resize_to_dimensions(self, width, height, method='linear'):
         # this method changes to a specific dimension sya 40 by 40 to 80 by 80 these
         # are to be specified in height and width
@@ -28,23 +107,23 @@ class ImageProcessor:
         
         :param width: The desired width of the image.
         :param height: The desired height of the image.
-        :param method: The interpolation method (default is 'linear').
-        """
-        print(f"Original dimensions: {self.get_dimensions()}")
-        methods = {
-            'linear': cv2.INTER_LINEAR,
-            'nearest': cv2.INTER_NEAREST,
-            'polynomial': cv2.INTER_CUBIC,
-        }
-        if method not in methods:
-            raise ValueError(f"Invalid method. Choose from {list(methods.keys())}.")
+        :param method: The interpolation method (default is 'linear'), 'area' for shrinking
+            or 'auto' to let plan_resize choose.
+        """
+        logger.info("Original dimensions: %s", self.get_dimensions())
+        methods = INTERPOLATION_METHODS
+        if method not in RESIZE_METHODS:
+            raise ValueError(f"Invalid method. Choose from {list(RESIZE_METHODS)}.")
         
-    
-        self.img = cv2.resize(self.img, (width, height), interpolation=methods[method])
-        print(f"Resized image dimensions: {self.get_dimensions()}")
+        if method == 'auto':
+            self.img = resize_planned(self.img, (width, height))
+        else:
+            self.img = cv2.resize(self.img, (width, height), interpolation=methods[method])
+        logger.info("Resized image dimensions: %s", self.get_dimensions())
         
     
 
+    @instrumented(state='img')
     def resize_by_scale(self, fx, fy, method='linear'):
         # it scales along the axis, so dimensions change
         # example if fx=10,fy=10 then 500 by 500 will change to 5000 by 5000 when u display
@@ -54,65 +133,632 @@ class ImageProcessor:
         
         :param fx: The scaling factor for the width.
         :param fy: The scaling factor for the height.
-        :param method: The interpolation method (default is 'linear').
-        """
-        print(f"Original dimensions: {self.get_dimensions()}")
-        methods = {
-            'linear': cv2.INTER_LINEAR,
-            'nearest': cv2.INTER_NEAREST,
-            'polynomial': cv2.INTER_CUBIC,
-        }
-        if method not in methods:
-            raise ValueError(f"Invalid method. Choose from {list(methods.keys())}.")
+        :param method: The interpolation method (default is 'linear'), 'area' for shrinking
+            or 'auto' to let plan_resize choose.
+        """
+        logger.info("Original dimensions: %s", self.get_dimensions())
+        methods = INTERPOLATION_METHODS
+        if method not in RESIZE_METHODS:
+            raise ValueError(f"Invalid method. Choose from {list(RESIZE_METHODS)}.")
         
-       
-        self.img = cv2.resize(self.img, None, fx=fx, fy=fy, interpolation=methods[method])
-        print(f"Resized image dimensions: {self.get_dimensions()}")
+        if method == 'auto':
+            height, width = self.img.shape[:2]
+            self.img = resize_planned(self.img, (max(1, round(width * fx)), max(1, round(height * fy))))
+        else:
+            self.img = cv2.resize(self.img, None, fx=fx, fy=fy, interpolation=methods[method])
+        logger.info("Resized image dimensions: %s", self.get_dimensions())
         
     
 
         
 
+    @instrumented(state='img')
     def blur_image(self, blur_type='box', ksize=(13, 13)):
         """
         Blur the image using different techniques.
-        
-        :param blur_type: Type of blurring ('box', 'gaussian', 'adaptive')
+
+        'box' and 'gaussian' are cv2.blur and cv2.GaussianBlur. 'adaptive' is a local mean
+        over the ksize window that only averages pixels inside the image. The other types
+        keep their cost per pixel constant for large kernels: 'box_integral' uses a
+        summed-area table, 'gaussian_stacked' three box passes, 'gaussian_iir' a recursive
+        filter (needs scipy) and 'gaussian_pyramid' blurs a downsampled copy and scales it
+        back up. The Gaussian approximations take their sigma from ksize like OpenCV does.
+
+        :param blur_type: Type of blurring, one of BLUR_TYPES
         :param ksize: Kernel size, tuple (width, height)
         """
-        if blur_type == 'box':
-            self.img = cv2.blur(self.img, ksize)
-            print("Applied Box Blurring")
-        elif blur_type == 'gaussian':
-            self.img = cv2.GaussianBlur(self.img, ksize, 0)
-            print("Applied Gaussian Blurring")
-        elif blur_type == 'adaptive':
-            self.img = cv2.adaptiveThreshold(self.img, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 11, 2)
-            print("Applied Adaptive Blurring")
-        else:
-            raise ValueError("Invalid blur type. Choose from 'box', 'gaussian', or 'adaptive'.")
+        if blur_type not in BLUR_TYPES:
+            raise ValueError(f"Invalid blur type. Choose from {list(BLUR_TYPES)}.")
+        self.img = _blur(self.img, blur_type, tuple(ksize), None)
+        logger.info("Applied %s Blurring", BLUR_TYPES[blur_type])
 
 
+    def pipeline(self, reorder_blurs=False):
+        """
+        Start a lazy pipeline on this image, see LazyPipeline.
+
+        :param reorder_blurs: Allow a blur followed by an 'area' or 'auto' downscale to run after
+            the downscale.
+        """
+        return LazyPipeline(self, reorder_blurs=reorder_blurs)
+
     def display_image(self, window_name='Image'):
         cv2.imshow(window_name, self.img)
         cv2.waitKey(0)
         cv2.destroyAllWindows()
 
-    def save_image(self, output_path):
+    @instrumented(state='img')
+    def save_image(self, output_path, show=None, writer=None, quality=None, png_compression=None):
+        """
+        Save the image, optionally showing it first.
+
+        With a writer (image_writer.ImageWriter) the encode and write happen in the
+        background and the returned future resolves once the file is on disk; call
+        writer.flush() as the barrier. Without one the image is written right away.
+
+        :param output_path: Destination file, its extension selects the format.
+        :param show: Show the image and wait for a key first (default only without a writer).
+        :param writer: Optional ImageWriter for non-blocking saves.
+        :param quality: JPEG/WebP quality (0-100).
+        :param png_compression: PNG compression level (0-9).
+        """
+        params = encoder_params(output_path, quality=quality, png_compression=png_compression)
+        if show is None:
+            show = writer is None
         try:
-            cv2.imshow('Image',self.img)
-            cv2.waitKey(0)
-            cv2.destroyAllWindows()
-            cv2.imwrite(output_path, self.img)
-            print(f"Image saved to {output_path}")
+            if show:
+                cv2.imshow('Image',self.img)
+                cv2.waitKey(0)
+                cv2.destroyAllWindows()
+            if writer is not None:
+                return writer.submit(output_path, self.img, params)
+            cv2.imwrite(output_path, self.img, params)
+            logger.info("Image saved to %s", output_path)
         except Exception as e:
-            print(f"Error saving image: {e}")
+            logger.error("Error saving image: %s", e)
 
     def get_dimensions(self):
         return self.img.shape
 
+    def apply_operations(self, operations):
+        """
+        Apply an ordered list of operations to the image.
+
+        :param operations: List of (name, kwargs) pairs, e.g.
+            [('resize_to_dimensions', {'width': 64, 'height': 64}), ('blur_image', {'blur_type': 'gaussian'})]
+        """
+        for name, kwargs in operations:
+            if name not in BATCH_OPERATIONS:
+                raise ValueError(f"Invalid operation '{name}'. Choose from {list(BATCH_OPERATIONS)}.")
+            getattr(self, name)(**(kwargs or {}))
+
+
+class LazyPipeline:
+    """
+    Records resize and blur calls and runs them as one planned pass.
+
+    Nothing is computed until run() or commit(). The planner folds consecutive resizes
+    into a single resample and, when reorder_blurs is set, moves a box/gaussian blur
+    behind an 'area' or 'auto' downscale that follows it, with the kernel scaled by the
+    same factor (equivalent up to resampling error, at a fraction of the cost). Intermediate
+    results live in buffers owned by the pipeline and are reused between runs; blurs
+    run in place on them, so the source image is never copied or modified.
+
+    Example:
+        result = processor.pipeline().resize_by_scale(0.5, 0.5).resize_to_dimensions(64, 64).blur_image().run()
+    """
+
+    def __init__(self, processor, reorder_blurs=False):
+        self.processor = processor
+        self.reorder_blurs = reorder_blurs
+        self.steps = []
+        self._buffers = {}
+
+    def resize_to_dimensions(self, width, height, method='linear'):
+        """Record a resize to a specific width and height."""
+        if method not in RESIZE_METHODS:
+            raise ValueError(f"Invalid method. Choose from {list(RESIZE_METHODS)}.")
+        self.steps.append(('resize', {'size': (width, height), 'method': method}))
+        return self
+
+    def resize_by_scale(self, fx, fy, method='linear'):
+        """Record a resize by scaling factors (fx and fy)."""
+        if method not in RESIZE_METHODS:
+            raise ValueError(f"Invalid method. Choose from {list(RESIZE_METHODS)}.")
+        self.steps.append(('resize', {'scale': (fx, fy), 'method': method}))
+        return self
+
+    def blur_image(self, blur_type='box', ksize=(13, 13)):
+        """Record a blur, see ImageProcessor.blur_image."""
+        if blur_type not in BLUR_TYPES:
+            raise ValueError(f"Invalid blur type. Choose from {list(BLUR_TYPES)}.")
+        self.steps.append(('blur', {'blur_type': blur_type, 'ksize': tuple(ksize)}))
+        return self
+
+    def plan(self):
+        """
+        Resolve the recorded steps into the list that run() executes.
+
+        :return: List of ('resize', (width, height), interpolation or 'auto') and ('blur', blur_type, ksize) tuples.
+        """
+        height, width = self.processor.img.shape[:2]
+        planned = []
+        for kind, args in self.steps:
+            if kind == 'resize':
+                if 'size' in args:
+                    size = args['size']
+                else:
+                    fx, fy = args['scale']
+                    size = (max(1, round(width * fx)), max(1, round(height * fy)))
+                planned.append(('resize', size, INTERPOLATION_METHODS.get(args['method'], 'auto'), (width, height)))
+                width, height = size
+            else:
+                planned.append(('blur', args['blur_type'], args['ksize']))
+
+        changed = True
+        while changed:
+            changed = False
+            for i in range(len(planned) - 1):
+                step, following = planned[i], planned[i + 1]
+                if step[0] == 'resize' and following[0] == 'resize':
+                    # two resamples in a row: go straight from the first source size to the last size,
+                    # keeping the low-pass of an area/pyramid step when the whole is a downscale
+                    planned[i:i + 2] = [('resize', following[1], _merged_interpolation(step, following), step[3])]
+                    changed = True
+                    break
+                # only an area or pyramid ('auto') downscale low-passes like the blur it replaces;
+                # nearest/linear/cubic sample without averaging and would alias
+                if (self.reorder_blurs and step[0] == 'blur' and following[0] == 'resize'
+                        and following[2] in (cv2.INTER_AREA, 'auto')
+                        and _is_downscale(following[3], following[1])):
+                    ksize = _scale_ksize(step[2], following[1], following[3], odd=step[1] == 'gaussian')
+                    planned[i:i + 2] = [following, ('blur', step[1], ksize)]
+                    changed = True
+                    break
+        return [step[:3] for step in planned
+                if not (step[0] == 'resize' and step[1] == step[3])]
+
+    @instrumented()
+    def run(self, dst=None):
+        """
+        Execute the planned steps.
+
+        :param dst: Optional preallocated output array with the final shape and dtype.
+        :return: The result. Without dst it is a pipeline buffer that the next run() reuses,
+            pass dst or call commit() to keep it.
+        """
+        planned = self.plan()
+        current = self.processor.img
+        if not planned:
+            if dst is None:
+                return current
+            np.copyto(dst, current)
+            return dst
+        for index, step in enumerate(planned):
+            last = index == len(planned) - 1
+            if step[0] == 'resize':
+                width, height = step[1]
+                out = dst if last and dst is not None else self._buffer((height, width) + current.shape[2:], current.dtype, current)
+                if step[2] == 'auto':
+                    current = resize_planned(current, (width, height), dst=out)
+                else:
+                    current = cv2.resize(current, (width, height), dst=out, interpolation=step[2])
+            else:
+                if last and dst is not None:
+                    out = dst
+                elif current is self.processor.img:
+                    out = self._buffer(current.shape, current.dtype, current)
+                else:
+                    out = current
+                current = _blur(current, step[1], step[2], out)
+        return current
+
+    def commit(self):
+        """Run the pipeline, store the result as the processor image and clear the recorded steps."""
+        result = self.run()
+        # hand the buffer over to the processor so a later run cannot overwrite it
+        for buffers in self._buffers.values():
+            if any(buffer is result for buffer in buffers):
+                buffers[:] = [buffer for buffer in buffers if buffer is not result]
+        self.processor.img = result
+        self.steps = []
+        return result
+
+    def _buffer(self, shape, dtype, avoid):
+        buffers = self._buffers.setdefault((shape, np.dtype(dtype).str), [])
+        for buffer in buffers:
+            if buffer is not avoid:
+                return buffer
+        buffer = np.empty(shape, dtype)
+        buffers.append(buffer)
+        return buffer
+
+
+def read_image_size(path):
+    """
+    Read (width, height) from a PNG or JPEG header without decoding the pixels.
+
+    :return: (width, height), or None for other formats or unreadable headers.
+    """
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(26)
+            if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+                return struct.unpack('>II', head[16:24])
+            if head[:2] != b'\xff\xd8':
+                return None
+            f.seek(2)
+            while True:
+                marker = f.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF:
+                    return None
+                code = marker[1]
+                if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+                    continue
+                (length,) = struct.unpack('>H', f.read(2))
+                # start-of-frame markers carry precision, height and width
+                if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+                    height, width = struct.unpack('>xHH', f.read(5))
+                    return width, height
+                f.seek(length - 2, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None
+
+
+def reduced_read_flags(src_size, dst_size, grayscale=False):
+    """
+    Pick the largest IMREAD_REDUCED_* decode that still yields at least dst_size.
+
+    :return: cv2.imread flags, or None when a full-resolution decode is needed.
+    """
+    for factor, flags in REDUCED_READ_FLAGS.items():
+        if src_size[0] // factor >= dst_size[0] and src_size[1] // factor >= dst_size[1]:
+            return flags[1] if grayscale else flags[0]
+    return None
+
+
+def choose_interpolation(src_size, dst_size):
+    """Area for shrinking, linear for mild and cubic for strong enlargement (see whyresize.md)."""
+    if dst_size[0] <= src_size[0] and dst_size[1] <= src_size[1]:
+        return cv2.INTER_AREA
+    if dst_size[0] >= 2 * src_size[0] or dst_size[1] >= 2 * src_size[1]:
+        return cv2.INTER_CUBIC
+    return cv2.INTER_LINEAR
+
+
+def plan_resize(src_size, dst_size):
+    """
+    Plan the cheapest correct resize from src_size to dst_size (both (width, height)).
+
+    Large shrink factors first halve the image with cv2.pyrDown (a Gaussian low-pass plus
+    decimation, so nothing aliases) while it stays at least twice the target, and the
+    final step is an area resample of less than 4x. Other cases are a single resize.
+
+    :return: (number of pyrDown stages, interpolation of the final cv2.resize).
+    """
+    width, height = src_size
+    levels = 0
+    while (width + 1) // 2 >= 2 * dst_size[0] and (height + 1) // 2 >= 2 * dst_size[1]:
+        width, height = (width + 1) // 2, (height + 1) // 2
+        levels += 1
+    return levels, choose_interpolation((width, height), dst_size)
+
+
+def resize_planned(img, dst_size, dst=None):
+    """Resize img to dst_size (width, height) following plan_resize."""
+    levels, interpolation = plan_resize((img.shape[1], img.shape[0]), dst_size)
+    for _ in range(levels):
+        img = cv2.pyrDown(img)
+    return cv2.resize(img, dst_size, dst=dst, interpolation=interpolation)
+
+
+def _merged_interpolation(step, following):
+    methods = (step[2], following[2])
+    if _is_downscale(step[3], following[1]) and any(m in (cv2.INTER_AREA, 'auto') for m in methods):
+        return 'auto' if 'auto' in methods else cv2.INTER_AREA
+    return following[2]
+
+
+def _is_downscale(src_size, dst_size):
+    return dst_size[0] <= src_size[0] and dst_size[1] <= src_size[1] and dst_size != src_size
+
+
+def _scale_ksize(ksize, dst_size, src_size, odd=False):
+    scaled = []
+    for k, dst, src in zip(ksize, dst_size, src_size):
+        k = max(1, round(k * dst / src))
+        if odd and k % 2 == 0:
+            k += 1
+        scaled.append(k)
+    return tuple(scaled)
+
+
+def _blur(img, blur_type, ksize, dst):
+    if blur_type == 'box':
+        return cv2.blur(img, ksize, dst=dst)
+    if blur_type == 'gaussian':
+        return cv2.GaussianBlur(img, ksize, 0, dst=dst)
+    if blur_type in ('adaptive', 'box_integral'):
+        return integral_box_blur(img, ksize, dst=dst, clip=blur_type == 'adaptive')
+    sigma = tuple(_ksize_to_sigma(k) for k in ksize)
+    if blur_type == 'gaussian_stacked':
+        return stacked_box_blur(img, sigma, dst=dst)
+    if blur_type == 'gaussian_iir':
+        return iir_gaussian_blur(img, sigma, dst=dst)
+    return pyramid_gaussian_blur(img, sigma, dst=dst)
+
+
+def _ksize_to_sigma(k):
+    # the sigma cv2.getGaussianKernel picks for a kernel of size k
+    return 0.3 * ((k - 1) * 0.5 - 1) + 0.8
+
+
+def _store(result, like, dst):
+    """Round and saturate a float result into like's dtype, into dst if given."""
+    if dst is None:
+        dst = np.empty(like.shape, like.dtype)
+    if np.issubdtype(like.dtype, np.integer):
+        info = np.iinfo(like.dtype)
+        np.clip(np.rint(result, out=result), info.min, info.max, out=result)
+    np.copyto(dst, result.reshape(like.shape), casting='unsafe')
+    return dst
+
+
+def integral_box_blur(img, ksize, dst=None, clip=False):
+    """
+    Box filter from a summed-area table: four lookups per pixel for any window size.
+
+    :param ksize: Window (width, height), anchored like cv2.blur.
+    :param clip: Average only the pixels of the window that fall inside the image (a local
+        mean without border extrapolation) instead of reflecting the border like cv2.blur.
+    """
+    kw, kh = ksize
+    ax, ay = kw // 2, kh // 2
+    height, width = img.shape[:2]
+    # window sums fit in int32 even when the table itself wraps around
+    sdepth = cv2.CV_32S if img.dtype == np.uint8 and kw * kh < 2 ** 31 // 255 else cv2.CV_64F
+    # pad so every window lies inside the table; with clip the padding is zeros and the
+    # sum is divided by the number of real pixels in the window
+    border = cv2.BORDER_CONSTANT if clip else cv2.BORDER_REFLECT_101
+    padded = cv2.copyMakeBorder(img, ay, kh - 1 - ay, ax, kw - 1 - ax, border, value=0)
+    table = cv2.integral(padded, sdepth=sdepth)
+    sums = table[kh:, kw:] - table[:-kh, kw:] - table[kh:, :-kw] + table[:-kh, :-kw]
+    sums = sums.astype(np.float32 if sdepth == cv2.CV_32S else np.float64)
+    if clip:
+        rows = np.minimum(np.arange(height) - ay + kh, height) - np.maximum(np.arange(height) - ay, 0)
+        cols = np.minimum(np.arange(width) - ax + kw, width) - np.maximum(np.arange(width) - ax, 0)
+        count = np.outer(rows, cols).astype(sums.dtype)
+        if sums.ndim == 3:
+            count = count[:, :, None]
+    else:
+        count = kw * kh
+    return _store(sums / count, img, dst)
+
+
+def _box_sizes(sigma, passes=3):
+    """Widths of `passes` box filters whose combined variance is closest to sigma^2."""
+    ideal = np.sqrt(12 * sigma ** 2 / passes + 1)
+    lower = int(ideal) - (int(ideal) % 2 == 0)
+    upper = lower + 2
+    small = round((12 * sigma ** 2 - passes * lower ** 2 - 4 * passes * lower - 3 * passes) / (-4 * lower - 4))
+    return [lower if i < small else upper for i in range(passes)]
+
+
+def stacked_box_blur(img, sigma, dst=None, passes=3):
+    """
+    Gaussian approximated by repeated box filters (cv2.blur keeps running sums, so each
+    pass costs the same for any width).
+
+    :param sigma: Standard deviation (x, y) in pixels.
+    """
+    result = img.astype(np.float32)
+    for bx, by in zip(_box_sizes(sigma[0], passes), _box_sizes(sigma[1], passes)):
+        cv2.blur(result, (bx, by), dst=result)
+    return _store(result, img, dst)
+
+
+def _iir_coefficients(sigma):
+    # Young & van Vliet (1995) third order recursive Gaussian
+    if sigma >= 2.5:
+        q = 0.98711 * sigma - 0.96330
+    else:
+        q = 3.97156 - 4.14554 * np.sqrt(1 - 0.26891 * sigma)
+    b0 = 1.57825 + 2.44413 * q + 1.4281 * q ** 2 + 0.422205 * q ** 3
+    b1 = 2.44413 * q + 2.85619 * q ** 2 + 1.26661 * q ** 3
+    b2 = -(1.4281 * q ** 2 + 1.26661 * q ** 3)
+    b3 = 0.422205 * q ** 3
+    return [1 - (b1 + b2 + b3) / b0], [1, -b1 / b0, -b2 / b0, -b3 / b0]
+
+
+def _iir_boundary(b, a):
+    # Triggs & Sdika (2006): with a replicated border the anti-causal pass' previous outputs
+    # are linear in the causal pass' last three outputs minus the edge value. The matrix is
+    # found by running both passes past the edge on each unit state until it has decayed.
+    from scipy.signal import lfilter, lfiltic
+
+    length = int(np.ceil(np.log(1e-10) / np.log(np.abs(np.roots(a)).max())))
+    states = np.array([lfiltic(b, a, unit) for unit in np.eye(len(a) - 1)])
+    causal, _ = lfilter(b, a, np.zeros((len(states), length)), zi=states)
+    anti_causal = lfilter(b, a, causal[:, ::-1])[:, ::-1]
+    return anti_causal[:, :len(states)].T.astype(np.float32)
+
+
+def _iir_pass(rows, sigma):
+    # Causal then anti-causal recursion down axis 0 of a float32 (n, m) array, in place.
+    # Each step is a whole contiguous row, so the loop runs n times rather than n * m.
+    (gain,), a = _iir_coefficients(sigma)
+    coefficients = [-c / gain for c in a[1:]]
+    boundary = _iir_boundary([gain], a)
+    n = len(rows)
+    first, last = rows[0].copy(), rows[-1].copy()
+    previous = [first] * 3
+    for order in (range(n), range(n - 1, -1, -1)):
+        if order.step < 0:
+            tail = np.stack([rows[max(n - 1 - i, 0)] for i in range(3)]) - last
+            previous = list(np.tensordot(boundary, tail, axes=1) + last)
+        p1, p2, p3 = previous
+        for i in order:
+            row = rows[i]
+            cv2.scaleAdd(p1, coefficients[0], row, dst=row)
+            cv2.scaleAdd(p2, coefficients[1], row, dst=row)
+            cv2.scaleAdd(p3, coefficients[2], row, dst=row)
+            row *= gain
+            p1, p2, p3 = row, p1, p2
+
+
+def iir_gaussian_blur(img, sigma, dst=None):
+    """
+    Gaussian approximated by a causal plus an anti-causal recursive filter along each axis,
+    a fixed number of operations per pixel for any sigma. Borders are treated as replicated,
+    the anti-causal pass starts from the Triggs & Sdika boundary state.
+
+    Both passes run down the rows in float32, the image is transposed for the x pass.
+
+    :param sigma: Standard deviation (x, y) in pixels, at least 0.5 to have any effect.
+    """
+    result = cv2.transpose(img).astype(np.float32)
+    if sigma[0] >= 0.5:
+        _iir_pass(result.reshape(len(result), -1), sigma[0])
+    result = cv2.transpose(result)
+    if sigma[1] >= 0.5:
+        _iir_pass(result.reshape(len(result), -1), sigma[1])
+    return _store(result, img, dst)
+
+
+def pyramid_gaussian_blur(img, sigma, dst=None, min_sigma=2.0):
+    """
+    Large Gaussian computed on a downsampled copy: pyrDown until the remaining blur is
+    about min_sigma pixels at that level, GaussianBlur there and resize back up.
+
+    Every pyrDown level halves the resolution and itself adds a Gaussian of sigma 1 at its
+    input scale, which is subtracted from the requested variance.
+
+    :param sigma: Standard deviation (x, y) in pixels of the full resolution image.
+    """
+    height, width = img.shape[:2]
+    levels = 0
+    while (min(sigma) / 2 ** (levels + 1) >= min_sigma
+           and min(height, width) >> (levels + 1) >= 8):
+        levels += 1
+    small = img
+    for _ in range(levels):
+        small = cv2.pyrDown(small)
+    done = (4 ** levels - 1) / 3
+    residual = [np.sqrt(max(s ** 2 - done, 0)) / 2 ** levels for s in sigma]
+    if max(residual) > 0:
+        small = cv2.GaussianBlur(small, (0, 0), sigmaX=max(residual[0], 1e-3), sigmaY=max(residual[1], 1e-3))
+    if levels == 0:
+        if dst is None:
+            return small
+        np.copyto(dst, small)
+        return dst
+    return cv2.resize(small, (width, height), dst=dst, interpolation=cv2.INTER_LINEAR)
+
+
+def collect_image_paths(source):
+    """
+    Expand a directory, a glob pattern or a list of paths into a sorted list of image paths.
+    """
+    if isinstance(source, (list, tuple)):
+        return list(source)
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)]
+    else:
+        paths = glob.glob(source, recursive=True)
+    return sorted(p for p in paths if p.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(p))
+
+
+def _init_batch_worker():
+    # every worker already owns a core, so keep OpenCV from spawning its own threads
+    cv2.setNumThreads(1)
+
+
+def output_paths(paths, source, output_dir):
+    """
+    Output path of every input path: its path relative to the source directory, or to the
+    deepest directory shared by all paths of a glob pattern or list, below output_dir.
+
+    :return: List of output paths in the order of paths.
+    """
+    if isinstance(source, str) and os.path.isdir(source):
+        root = source
+    else:
+        root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths]) if paths else ''
+    outputs, seen = [], {}
+    for path in paths:
+        output_path = os.path.join(output_dir, os.path.relpath(os.path.abspath(path), os.path.abspath(root)))
+        key = os.path.normcase(os.path.normpath(output_path))
+        if key in seen:
+            raise ValueError(f"{seen[key]} and {path} would both be written to {output_path}")
+        seen[key] = path
+        outputs.append(output_path)
+    return outputs
+
+
+def _process_one(path, operations, output_path):
+    """Worker entry point: decode, apply the operations and write the result."""
+    # every batch image is read once, caching it would only evict useful entries
+    processor = ImageProcessor(path, use_cache=False)
+    processor.apply_operations(operations)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    if not cv2.imwrite(output_path, processor.img):
+        raise IOError(f"Could not write {output_path}")
+    return output_path
+
+
+def process_batch(source, operations, output_dir, workers=None, max_in_flight=None):
+    """
+    Process every image of a directory or glob pattern on a pool of worker processes.
+
+    Only paths travel to the workers and each worker writes its own result, so decoded
+    pixels never cross process boundaries. At most max_in_flight images are queued at a
+    time, which keeps memory bounded no matter how large the batch is. A failing image is
+    reported and skipped, the rest of the batch keeps going.
+
+    :param source: Directory, glob pattern (e.g. 'images/**/*.png') or list of paths.
+    :param operations: Ordered list of (name, kwargs) pairs, see ImageProcessor.apply_operations.
+    :param output_dir: Directory the processed images are written to, keeping their paths
+        relative to the source (see output_paths); two inputs that would get the same output
+        path raise ValueError before anything is processed.
+    :param workers: Number of worker processes (default is the number of cores).
+    :param max_in_flight: Maximum number of submitted but unfinished images (default 2 per worker).
+    :return: List of (input_path, output_path, error) tuples in completion order,
+        output_path is None and error holds the message when the image failed.
+    """
+    for name, _ in operations:
+        if name not in BATCH_OPERATIONS:
+            raise ValueError(f"Invalid operation '{name}'. Choose from {list(BATCH_OPERATIONS)}.")
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+
+    results = []
+    paths = collect_image_paths(source)
+    jobs = iter(zip(paths, output_paths(paths, source, output_dir)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker) as pool:
+        pending = {}
+        while True:
+            for path, output_path in jobs:
+                pending[pool.submit(_process_one, path, operations, output_path)] = path
+                if len(pending) >= max_in_flight:
+                    break
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    results.append((path, future.result(), None))
+                except Exception as e:
+                    logger.error("Error processing %s: %s", path, e)
+                    results.append((path, None, str(e)))
+    failed = sum(1 for _, _, error in results if error)
+    logger.info("Processed %d images, %d failed", len(results) - failed, failed)
+    return results
+
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     IMG_PATH = 'images/img.png'
     # processor = ImageProcessor(IMG_PATH)
     # print(f"Original image dimensions: {processor.get_dimensions()}")
@@ -127,5 +773,9 @@ if __name__ == '__main__':
 
 
     processor = ImageProcessor(IMG_PATH)
-    processor.resize_image(5,5)
+    processor.resize_to_dimensions(5,5)
+
+    # process_batch('images', [('resize_to_dimensions', {'width': 64, 'height': 64}),
+    #                          ('blur_image', {'blur_type': 'gaussian', 'ksize': (5, 5)})],
+    #               'edited_images/batch')
     
\ No newline at end of file
@@ -1,19 +1,41 @@
+import logging
+
 import cv2
 import numpy as np
 
+import image_cache
+from artifact_sink import DiskSink
+from instrumentation import instrumented
+
+logger = logging.getLogger(__name__)
+
 class ImageProcessor:
-    def __init__(self, image_path):
+    def __init__(self, image_path, sink=None):
+        """
+        :param image_path: Path of the image to read.
+        :param sink: Where intermediate images go (see artifact_sink), by default
+            they are written into the current directory.
+        """
         self.image_path = image_path
+        self.sink = sink if sink is not None else DiskSink()
         self.image = None
         self.gray_image = None
         self.binary_image = None
 
+    @classmethod
+    def from_array(cls, image, image_path=None, sink=None):
+        """Creates a processor around an already decoded BGR image."""
+        processor = cls(image_path, sink)
+        processor.image = image
+        return processor
+
+    @instrumented(state='image')
     def read_image(self):
         """Reads the image from the specified path."""
-        self.image = cv2.imread(self.image_path)
+        self.image = image_cache.imread(self.image_path)
         if self.image is None:
             raise FileNotFoundError(f"Image not found at {self.image_path}")
-        print("Image read successfully.")
+        logger.info("Image read successfully.")
 
     def display_image(self, window_name, image):
         """Displays the given image in a window."""
@@ -26,43 +48,47 @@ class ImageProcessor:
         if self.image is None:
             raise ValueError("Image not loaded. Call read_image() first.")
         height, width, channels = self.image.shape
-        print(f"Image Size: Height={height}, Width={width}, Channels={channels}")
+        logger.info("Image Size: Height=%d, Width=%d, Channels=%d", height, width, channels)
         return height, width, channels
 
     def calculate_image_pixels(self):
         """Calculates and returns the total number of pixels in the image."""
         height, width, _ = self.extract_image_size()
         total_pixels = height * width
-        print(f"Total Pixels: {total_pixels}")
+        logger.info("Total Pixels: %d", total_pixels)
         return total_pixels
 
+    @instrumented(state='image')
     def convert_to_grayscale(self):
         """Converts the image to grayscale and saves it."""
         if self.image is None:
             raise ValueError("Image not loaded. Call read_image() first.")
         self.gray_image = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
-        cv2.imwrite("gray_image.jpg", self.gray_image)
-        print("Grayscale image saved as 'gray_image.jpg'.")
+        self.sink.write("gray_image.jpg", self.gray_image)
+        logger.info("Grayscale image saved as 'gray_image.jpg'.")
         return self.gray_image
 
+    @instrumented(state='gray_image')
     def convert_to_binary(self, threshold=128):
         """Converts the grayscale image to binary and saves it."""
         if self.gray_image is None:
             raise ValueError("Grayscale image not available. Call convert_to_grayscale() first.")
         _, self.binary_image = cv2.threshold(self.gray_image, threshold, 255, cv2.THRESH_BINARY)
-        cv2.imwrite("binary_image.jpg", self.binary_image)
-        print("Binary image saved as 'binary_image.jpg'.")
+        self.sink.write("binary_image.jpg", self.binary_image)
+        logger.info("Binary image saved as 'binary_image.jpg'.")
         return self.binary_image
 
+    @instrumented(state='binary_image')
     def count_black_pixels(self):
         """Counts the number of black pixels in the binary image."""
         if self.binary_image is None:
             raise ValueError("Binary image not available. Call convert_to_binary() first.")
         black_pixels = np.sum(self.binary_image == 0)
-        print(f"Black Pixels Count: {black_pixels}")
+        logger.info("Black Pixels Count: %d", black_pixels)
         return black_pixels
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
 
     image_path = "images/img.png"  
     processor = ImageProcessor(image_path)
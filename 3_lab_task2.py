@@ -1,20 +1,193 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
 import numpy as np
 from skimage.filters import sobel, prewitt, roberts
 
+import image_cache
+from artifact_sink import DiskSink
+from instrumentation import instrumented
+
+logger = logging.getLogger(__name__)
+
+
+def _sobel(gray):
+    return (sobel(gray) * 255).astype(np.uint8)
+
+
+def _prewitt(gray):
+    return (prewitt(gray) * 255).astype(np.uint8)
+
+
+def _roberts(gray):
+    return (roberts(gray) * 255).astype(np.uint8)
+
+
+def _canny(gray):
+    return cv2.Canny(gray, 100, 200)
+
+
+def _global_threshold(gray):
+    return cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY)[1]
+
+
+def _adaptive_threshold(gray):
+    return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+
+
+EDGE_MAPS = ('sobel', 'prewitt', 'roberts', 'canny')
+_ROBERTS_KERNELS = (np.float32([[1, 0], [0, -1]]), np.float32([[0, 1], [-1, 0]]))
+
+
+def _magnitude_to_uint8(gx, gy, scale):
+    magnitude = cv2.magnitude(gx, gy)
+    magnitude *= np.float32(scale)
+    return magnitude.astype(np.uint8)
+
+
+def _edge_maps(gray, which=EDGE_MAPS, canny_thresholds=(100, 200)):
+    """
+    Computes several edge maps of one grayscale frame with shared derivatives.
+
+    One pair of exact int16 3x3 Sobel derivatives feeds Canny directly and, converted
+    to float32 once, the Sobel magnitude. Prewitt reuses them too: its kernel is the
+    Sobel kernel minus the central difference ([1, 2, 1] = [1, 1, 1] + [0, 1, 0]), so
+    only a cheap 1x3 difference is added. The scaling reproduces skimage's normalised
+    kernels and reflect borders, so the maps match _sobel/_prewitt/_roberts to within
+    one grey level (float32 instead of float64 rounding) and Canny matches exactly.
+    """
+    unknown = set(which) - set(EDGE_MAPS)
+    if unknown:
+        raise ValueError(f"Invalid edge map {sorted(unknown)}. Choose from {list(EDGE_MAPS)}.")
+    border = cv2.BORDER_REPLICATE  # same as skimage's 'reflect' for a one pixel reach
+    edges = {}
+    if {'sobel', 'prewitt', 'canny'} & set(which):
+        dx = cv2.Sobel(gray, cv2.CV_16S, 1, 0, borderType=border)
+        dy = cv2.Sobel(gray, cv2.CV_16S, 0, 1, borderType=border)
+        if 'canny' in which:
+            edges['canny'] = cv2.Canny(dx, dy, *canny_thresholds)
+        if {'sobel', 'prewitt'} & set(which):
+            gx, gy = dx.astype(np.float32), dy.astype(np.float32)
+            del dx, dy
+            if 'sobel' in which:
+                edges['sobel'] = _magnitude_to_uint8(gx, gy, np.sqrt(0.5) / 4)
+            if 'prewitt' in which:
+                gx -= cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=1, borderType=border)
+                gy -= cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=1, borderType=border)
+                edges['prewitt'] = _magnitude_to_uint8(gx, gy, np.sqrt(0.5) / 3)
+    if 'roberts' in which:
+        gray32 = gray.astype(np.float32)
+        r1, r2 = (cv2.filter2D(gray32, cv2.CV_32F, kernel, anchor=(0, 0), borderType=border)
+                  for kernel in _ROBERTS_KERNELS)
+        edges['roberts'] = _magnitude_to_uint8(r1, r2, np.sqrt(0.5))
+    return {name: edges[name] for name in which}
+
+
+def _watershed_markers(gray):
+    """Seed markers as in the original watershed: 1 sure background, 2.. objects, 0 unknown."""
+    ret, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    kernel = np.ones((3, 3), np.uint8)
+    sure_bg = cv2.dilate(thresh, kernel, iterations=2)
+    dist_transform = cv2.distanceTransform(thresh, cv2.DIST_L2, 5)
+    ret, sure_fg = cv2.threshold(dist_transform, 0.7 * dist_transform.max(), 255, 0)
+    sure_fg = np.uint8(sure_fg)
+    unknown = cv2.subtract(sure_bg, sure_fg)
+    ret, markers = cv2.connectedComponents(sure_fg)
+    markers = markers + 1
+    markers[unknown == 255] = 0
+    return markers
+
+
+def _watershed(image, gray, levels=0, band=2):
+    """
+    Watershed labels of a BGR image (-1 on boundaries), optionally coarse to fine.
+
+    With levels > 0 the markers and a first watershed are computed on the image shrunk
+    levels times with pyrDown. The coarse labels are scaled back with nearest neighbour,
+    a band of band pixels per level around every coarse boundary is reset to unknown, and
+    only that band is flooded again at full resolution.
+    """
+    if levels == 0:
+        return cv2.watershed(image, _watershed_markers(gray))
+    small, small_gray = image, gray
+    for _ in range(levels):
+        small, small_gray = cv2.pyrDown(small), cv2.pyrDown(small_gray)
+    coarse = cv2.watershed(small, _watershed_markers(small_gray))
+    height, width = gray.shape
+    markers = cv2.resize(coarse, (width, height), interpolation=cv2.INTER_NEAREST)
+    # a pixel is near a boundary if the labels in its 3x3 neighbourhood disagree
+    labels = markers.astype(np.float32)
+    kernel = np.ones((3, 3), np.uint8)
+    edges = np.uint8(cv2.dilate(labels, kernel) != cv2.erode(labels, kernel))
+    radius = band * 2 ** levels
+    size = 2 * radius + 1
+    edges = cv2.dilate(edges, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (size, size)))
+    markers[edges > 0] = 0
+    markers[markers == -1] = 0
+    return cv2.watershed(image, markers)
+
+
+# operator name -> (function on a grayscale array, halo in pixels the function reads around a pixel)
+# Canny's hysteresis can follow weak edges further than any halo, so tiled Canny may differ
+# from the full-frame result where a weak edge chain crosses a tile border.
+TILE_OPERATORS = {
+    'sobel': (_sobel, 1),
+    'prewitt': (_prewitt, 1),
+    'roberts': (_roberts, 1),
+    'canny': (_canny, 32),
+    'global_threshold': (_global_threshold, 0),
+    'adaptive_threshold': (_adaptive_threshold, 5),
+}
+
 class ImageAnalyzer:
-    def __init__(self, image_path):
+    def __init__(self, image_path, sink=None):
+        """
+        :param image_path: Path of the image to read.
+        :param sink: Where intermediate images go (see artifact_sink), by default
+            they are written into the current directory.
+        """
         self.image_path = image_path
+        self.sink = sink if sink is not None else DiskSink()
         self.image = None
         self.gray_image = None
 
-    def read_image(self):
-        """Reads the image from the specified path."""
-        self.image = cv2.imread(self.image_path)
+    @classmethod
+    def from_array(cls, image, image_path=None, sink=None):
+        """Creates an analyzer around an already decoded BGR or grayscale image."""
+        analyzer = cls(image_path, sink)
+        if image.ndim == 2:
+            analyzer.gray_image = image
+        else:
+            analyzer.image = image
+            analyzer.gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return analyzer
+
+    @instrumented(state='gray_image')
+    def read_image(self, grayscale_only=False):
+        """
+        Reads the image from the specified path.
+
+        :param grayscale_only: Decode straight to grayscale and keep no color copy,
+            for huge images that are only processed in tiles.
+        """
+        if grayscale_only:
+            self.image = None
+            self.gray_image = image_cache.imread(self.image_path, cv2.IMREAD_GRAYSCALE)
+            if self.gray_image is None:
+                raise FileNotFoundError(f"Image not found at {self.image_path}")
+            logger.info("Image read as grayscale.")
+            return
+        self.image = image_cache.imread(self.image_path)
         if self.image is None:
             raise FileNotFoundError(f"Image not found at {self.image_path}")
         self.gray_image = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
-        print("Image read and converted to grayscale.")
+        logger.info("Image read and converted to grayscale.")
 
     def display_image(self, window_name, image):
         """Displays the given image in a window."""
@@ -22,76 +195,392 @@ class ImageAnalyzer:
         cv2.waitKey(0)
         cv2.destroyAllWindows()
 
+    @instrumented(state='gray_image')
     def sobel_operator(self):
         """Applies the Sobel operator for edge detection."""
-        sobel_edges = sobel(self.gray_image)
-        sobel_edges = (sobel_edges * 255).astype(np.uint8)
-        cv2.imwrite("sobel_edges.jpg", sobel_edges)
-        print("Sobel edges saved as 'sobel_edges.jpg'.")
+        sobel_edges = _sobel(self.gray_image)
+        self.sink.write("sobel_edges.jpg", sobel_edges)
+        logger.info("Sobel edges saved as 'sobel_edges.jpg'.")
         return sobel_edges
 
+    @instrumented(state='gray_image')
     def prewitt_operator(self):
         """Applies the Prewitt operator for edge detection."""
-        prewitt_edges = prewitt(self.gray_image)
-        prewitt_edges = (prewitt_edges * 255).astype(np.uint8)
-        cv2.imwrite("prewitt_edges.jpg", prewitt_edges)
-        print("Prewitt edges saved as 'prewitt_edges.jpg'.")
+        prewitt_edges = _prewitt(self.gray_image)
+        self.sink.write("prewitt_edges.jpg", prewitt_edges)
+        logger.info("Prewitt edges saved as 'prewitt_edges.jpg'.")
         return prewitt_edges
 
+    @instrumented(state='gray_image')
     def roberts_operator(self):
         """Applies the Roberts Cross operator for edge detection."""
-        roberts_edges = roberts(self.gray_image)
-        roberts_edges = (roberts_edges * 255).astype(np.uint8)
-        cv2.imwrite("roberts_edges.jpg", roberts_edges)
-        print("Roberts edges saved as 'roberts_edges.jpg'.")
+        roberts_edges = _roberts(self.gray_image)
+        self.sink.write("roberts_edges.jpg", roberts_edges)
+        logger.info("Roberts edges saved as 'roberts_edges.jpg'.")
         return roberts_edges
 
+    @instrumented(state='gray_image')
     def canny_edge_detection(self):
         """Applies the Canny edge detector."""
-        canny_edges = cv2.Canny(self.gray_image, 100, 200)
-        cv2.imwrite("canny_edges.jpg", canny_edges)
-        print("Canny edges saved as 'canny_edges.jpg'.")
+        canny_edges = _canny(self.gray_image)
+        self.sink.write("canny_edges.jpg", canny_edges)
+        logger.info("Canny edges saved as 'canny_edges.jpg'.")
         return canny_edges
 
+    @instrumented(state='gray_image')
+    def edge_maps(self, which=EDGE_MAPS, canny_thresholds=(100, 200)):
+        """
+        Computes several edge maps in one pass over shared float32 derivatives.
+
+        Much cheaper than calling sobel_operator(), prewitt_operator(), roberts_operator()
+        and canny_edge_detection() one after the other, and nothing is written to disk.
+
+        :param which: Names of the maps to compute, any of EDGE_MAPS.
+        :param canny_thresholds: (low, high) hysteresis thresholds for Canny.
+        :return: Dict of edge map name -> uint8 image.
+        """
+        if self.gray_image is None:
+            raise ValueError("Image not loaded. Call read_image() first.")
+        return _edge_maps(self.gray_image, which, canny_thresholds)
+
+    @instrumented(state='gray_image')
     def global_thresholding(self):
         """Applies global thresholding for segmentation."""
-        _, thresh_image = cv2.threshold(self.gray_image, 127, 255, cv2.THRESH_BINARY)
-        cv2.imwrite("global_threshold.jpg", thresh_image)
-        print("Global thresholding image saved as 'global_threshold.jpg'.")
+        thresh_image = _global_threshold(self.gray_image)
+        self.sink.write("global_threshold.jpg", thresh_image)
+        logger.info("Global thresholding image saved as 'global_threshold.jpg'.")
         return thresh_image
 
+    @instrumented(state='gray_image')
     def adaptive_thresholding(self):
         """Applies adaptive thresholding for segmentation."""
-        adaptive_thresh = cv2.adaptiveThreshold(
-            self.gray_image, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
-        )
-        cv2.imwrite("adaptive_threshold.jpg", adaptive_thresh)
-        print("Adaptive thresholding image saved as 'adaptive_threshold.jpg'.")
+        adaptive_thresh = _adaptive_threshold(self.gray_image)
+        self.sink.write("adaptive_threshold.jpg", adaptive_thresh)
+        logger.info("Adaptive thresholding image saved as 'adaptive_threshold.jpg'.")
         return adaptive_thresh
 
     def edge_detection_segmentation(self):
         """Uses Canny edge detection for segmentation."""
         return self.canny_edge_detection()
 
-    def watershed_segmentation(self):
-        """Applies the Watershed algorithm for region-based segmentation."""
-        ret, thresh = cv2.threshold(self.gray_image, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-        kernel = np.ones((3, 3), np.uint8)
-        sure_bg = cv2.dilate(thresh, kernel, iterations=2)
-        dist_transform = cv2.distanceTransform(thresh, cv2.DIST_L2, 5)
-        ret, sure_fg = cv2.threshold(dist_transform, 0.7 * dist_transform.max(), 255, 0)
-        sure_fg = np.uint8(sure_fg)
-        unknown = cv2.subtract(sure_bg, sure_fg)
-        ret, markers = cv2.connectedComponents(sure_fg)
-        markers = markers + 1
-        markers[unknown == 255] = 0
-        markers = cv2.watershed(self.image, markers)
-        self.image[markers == -1] = [255, 0, 0]
-        cv2.imwrite("watershed_segmentation.jpg", self.image)
-        print("Watershed segmentation result saved as 'watershed_segmentation.jpg'.")
-        return self.image
+    @instrumented(state='image')
+    def watershed_segmentation(self, levels=0, band=2):
+        """
+        Applies the Watershed algorithm for region-based segmentation.
+
+        The boundaries are painted on a copy, self.image is left untouched.
+
+        :param levels: Pyramid levels for the coarse-to-fine mode, see watershed_regions().
+        :param band: Boundary band half-width in coarse pixels, see watershed_regions().
+        :return: Copy of the image with the boundaries painted blue.
+        """
+        markers = _watershed(self._color_image(), self.gray_image, levels, band)
+        segmented = self._color_image().copy()
+        segmented[markers == -1] = [255, 0, 0]
+        self.sink.write("watershed_segmentation.jpg", segmented)
+        logger.info("Watershed segmentation result saved as 'watershed_segmentation.jpg'.")
+        return segmented
+
+    @instrumented(state='image')
+    def watershed_regions(self, levels=1, band=2):
+        """
+        Watershed segmentation returning labels and per-region statistics.
+
+        Markers and a first segmentation are computed levels pyrDown steps below full
+        resolution; only a band around the coarse boundaries is flooded again at full
+        resolution (levels=0 runs everything at full resolution). Regions and their
+        statistics come from a single connectedComponentsWithStats pass.
+
+        :param levels: Number of pyramid levels to go down for the coarse segmentation.
+        :param band: Half-width of the refined band around each boundary, in coarse pixels.
+        :return: (labels, regions). labels is an int32 array, 0 on the background and the
+            boundaries and 1..N for the regions. regions maps 'area' (N+1,), 'bbox' (N+1, 4)
+            as x, y, width, height and 'centroid' (N+1, 2) as x, y, indexed by label.
+        """
+        markers = _watershed(self._color_image(), self.gray_image, levels, band)
+        # label 1 is the background; 4-connectivity keeps regions apart across the
+        # diagonal steps of the boundary lines
+        count, labels, stats, centroids = cv2.connectedComponentsWithStats(
+            np.uint8(markers > 1), connectivity=4)
+        regions = {
+            'area': stats[:, cv2.CC_STAT_AREA],
+            'bbox': stats[:, :cv2.CC_STAT_AREA],
+            'centroid': centroids,
+        }
+        logger.info("Watershed found %d regions.", count - 1)
+        return labels, regions
+
+    def _color_image(self):
+        if self.image is not None:
+            return self.image
+        if self.gray_image is None:
+            raise ValueError("Image not loaded. Call read_image() first.")
+        return cv2.cvtColor(self.gray_image, cv2.COLOR_GRAY2BGR)
+
+    @instrumented(state='gray_image')
+    def tiled(self, operator, tile_size=1024, workers=None, out=None):
+        """
+        Runs an operator over overlapping tiles of the grayscale image and stitches the result.
+
+        Each tile is read with a halo as wide as the operator's kernel reach, so the stitched
+        output matches the full-frame operator (see TILE_OPERATORS for the Canny caveat).
+        Only the tiles currently being processed hold temporary arrays, which keeps peak memory
+        at a few tiles. gray_image may be a np.memmap and out a np.lib.format.open_memmap
+        array to keep even the input and output frames off the heap.
+
+        :param operator: One of TILE_OPERATORS ('sobel', 'prewitt', 'roberts', 'canny',
+            'global_threshold', 'adaptive_threshold').
+        :param tile_size: Edge length of a tile in pixels, without the halo.
+        :param workers: Number of threads (default is the number of cores).
+        :param out: Optional preallocated uint8 array with the shape of the grayscale image.
+        :return: The stitched uint8 result.
+        """
+        if self.gray_image is None:
+            raise ValueError("Image not loaded. Call read_image() first.")
+        if operator not in TILE_OPERATORS:
+            raise ValueError(f"Invalid operator. Choose from {list(TILE_OPERATORS.keys())}.")
+        func, halo = TILE_OPERATORS[operator]
+        gray = self.gray_image
+        height, width = gray.shape[:2]
+        if out is None:
+            out = np.empty((height, width), dtype=np.uint8)
+
+        def run_tile(tile):
+            y0, x0 = tile
+            y1, x1 = min(y0 + tile_size, height), min(x0 + tile_size, width)
+            top, left = max(y0 - halo, 0), max(x0 - halo, 0)
+            bottom, right = min(y1 + halo, height), min(x1 + halo, width)
+            result = func(np.ascontiguousarray(gray[top:bottom, left:right]))
+            out[y0:y1, x0:x1] = result[y0 - top:y1 - top, x0 - left:x1 - left]
+
+        tiles = [(y, x) for y in range(0, height, tile_size) for x in range(0, width, tile_size)]
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            # list() re-raises the first tile error
+            list(pool.map(run_tile, tiles))
+        return out
+    @staticmethod
+    def stream(source, operators=('canny',), **kwargs):
+        """
+        Runs operators on every frame of a video file or camera, see AnalyzerStream.
+
+        :param source: Video file path or camera index for cv2.VideoCapture.
+        :param operators: Names from TILE_OPERATORS to run on each frame.
+        :return: Per-stage statistics, see AnalyzerStream.run().
+        """
+        return AnalyzerStream(source, operators, **kwargs).run()
+
+
+DROP_POLICIES = ('block', 'drop_oldest', 'drop_newest')
+
+
+class StageStats:
+    """Frame count, drops, throughput and latency of one pipeline stage."""
+
+    def __init__(self, name, window=1000):
+        self.name = name
+        self.frames = 0
+        self.dropped = 0
+        self.latencies = deque(maxlen=window)
+        self.started = None
+        self.finished = None
+
+    def record(self, seconds):
+        if self.started is None:
+            self.started = time.perf_counter() - seconds
+        self.frames += 1
+        self.latencies.append(seconds)
+        self.finished = time.perf_counter()
+
+    def summary(self):
+        elapsed = (self.finished - self.started) if self.frames else 0
+        latencies = np.array(self.latencies) * 1000
+        return {
+            'frames': self.frames,
+            'dropped': self.dropped,
+            'fps': self.frames / elapsed if elapsed > 0 else 0.0,
+            'mean_ms': float(latencies.mean()) if len(latencies) else 0.0,
+            'p95_ms': float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+        }
+
+
+class AnalyzerStream:
+    """
+    Decode -> process -> encode pipeline over a cv2.VideoCapture source.
+
+    Each stage runs on its own thread and the stages are connected by bounded queues, so
+    decoding the next frame, analysing the current one and writing the previous one
+    overlap. When processing falls behind the decoder, drop_policy decides what happens
+    to new frames: 'block' pauses decoding (nothing is lost, right for files),
+    'drop_oldest' replaces the oldest queued frame and 'drop_newest' skips the new frame
+    (both keep live feeds real time).
+
+    Sobel, Prewitt, Roberts and Canny requested together share their derivatives
+    (see _edge_maps). Results go to output_dir as one video per operator and/or to
+    on_result(frame_index, {operator: image}).
+    """
+
+    def __init__(self, source, operators=('canny',), drop_policy='block', queue_size=8,
+                 output_dir=None, on_result=None, max_frames=None, fourcc='mp4v'):
+        unknown = set(operators) - set(TILE_OPERATORS)
+        if unknown:
+            raise ValueError(f"Invalid operator {sorted(unknown)}. Choose from {list(TILE_OPERATORS.keys())}.")
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Invalid drop policy. Choose from {list(DROP_POLICIES)}.")
+        self.source = source
+        self.operators = tuple(operators)
+        self.drop_policy = drop_policy
+        self.output_dir = output_dir
+        self.on_result = on_result
+        self.max_frames = max_frames
+        self.fourcc = fourcc
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.results = queue.Queue(maxsize=queue_size)
+        self.stats = {name: StageStats(name) for name in ('decode', 'process', 'encode', 'end_to_end')}
+        self._stop = threading.Event()
+        self._errors = []
+        self.fps = None
+
+    def stop(self):
+        """Asks the decoder to stop; frames already queued are still processed."""
+        self._stop.set()
+
+    def run(self):
+        """
+        Runs the pipeline until the source ends, max_frames is reached or stop() is called.
+
+        :return: Dict of stage name -> {'frames', 'dropped', 'fps', 'mean_ms', 'p95_ms'},
+            with an extra 'end_to_end' entry measured from capture to encoded output.
+        """
+        capture = cv2.VideoCapture(self.source)
+        if not capture.isOpened():
+            raise FileNotFoundError(f"Could not open video source {self.source}")
+        self.fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        stages = [
+            threading.Thread(target=self._guard, args=(self._decode, self.frames, capture), name='decode'),
+            threading.Thread(target=self._guard, args=(self._process, self.results), name='process'),
+            threading.Thread(target=self._guard, args=(self._encode, None), name='encode'),
+        ]
+        for stage in stages:
+            stage.start()
+        for stage in stages:
+            stage.join()
+        capture.release()
+        if self._errors:
+            raise self._errors[0]
+        return {name: stats.summary() for name, stats in self.stats.items()}
+
+    def _guard(self, stage, downstream, *args):
+        try:
+            stage(*args)
+        except Exception as e:
+            self._errors.append(e)
+            self._stop.set()
+            self._put(downstream, None)
+
+    # once a stage has failed, the others must not wait forever on a queue nobody serves
+    def _put(self, target, item):
+        if target is None:
+            return
+        while True:
+            try:
+                target.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if self._errors:
+                    return
+
+    def _get(self, source):
+        while True:
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                if self._errors:
+                    return None
+
+    def _decode(self, capture):
+        frames = self.frames
+        stats = self.stats['decode']
+        index = 0
+        try:
+            while not self._stop.is_set() and (self.max_frames is None or index < self.max_frames):
+                start = time.perf_counter()
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                stats.record(time.perf_counter() - start)
+                item = (index, frame, start)
+                index += 1
+                if self.drop_policy == 'block':
+                    self._put(frames, item)
+                    continue
+                try:
+                    frames.put_nowait(item)
+                except queue.Full:
+                    stats.dropped += 1
+                    if self.drop_policy == 'drop_oldest':
+                        try:
+                            frames.get_nowait()
+                        except queue.Empty:
+                            pass
+                        frames.put_nowait(item)
+        finally:
+            self._put(frames, None)
+
+    def _process(self):
+        results = self.results
+        stats = self.stats['process']
+        edge_names = [name for name in self.operators if name in EDGE_MAPS]
+        other_names = [name for name in self.operators if name not in EDGE_MAPS]
+        while True:
+            item = self._get(self.frames)
+            if item is None:
+                break
+            index, frame, captured = item
+            start = time.perf_counter()
+            gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            outputs = _edge_maps(gray, edge_names) if edge_names else {}
+            for name in other_names:
+                outputs[name] = TILE_OPERATORS[name][0](gray)
+            stats.record(time.perf_counter() - start)
+            self._put(results, (index, outputs, captured))
+        self._put(results, None)
+
+    def _encode(self):
+        stats = self.stats['encode']
+        writers = {}
+        try:
+            while True:
+                item = self._get(self.results)
+                if item is None:
+                    break
+                index, outputs, captured = item
+                start = time.perf_counter()
+                if self.output_dir is not None:
+                    for name, image in outputs.items():
+                        if name not in writers:
+                            writers[name] = self._open_writer(name, image)
+                        writers[name].write(image)
+                if self.on_result is not None:
+                    self.on_result(index, outputs)
+                done = time.perf_counter()
+                stats.record(done - start)
+                self.stats['end_to_end'].record(done - captured)
+        finally:
+            for writer in writers.values():
+                writer.release()
+
+    def _open_writer(self, name, image):
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{name}.mp4")
+        height, width = image.shape[:2]
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, (width, height),
+                                 isColor=image.ndim == 3)
+        if not writer.isOpened():
+            raise IOError(f"Could not open video writer for {path}")
+        return writer
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
 
     image_path = "images/img.png"  
     analyzer = ImageAnalyzer(image_path)
@@ -0,0 +1,112 @@
+"""
+Destinations for the intermediate images that ImageProcessor (3_lab.py) and ImageAnalyzer
+(3_lab_task2.py) produce, e.g. 'sobel_edges.jpg' or 'gray_image.jpg'.
+
+    DiskSink       synchronous cv2.imwrite into a directory (the default, same files as before)
+    NullSink       drops everything, operators cost only their compute
+    MemorySink     keeps the arrays in a dict, for tests and in-process consumers
+    AsyncDiskSink  encodes and writes on background threads (image_writer.ImageWriter)
+    MemmapSink     stores raw arrays as memory-mapped .npy files, no encoding at all
+
+Give every parallel worker its own directory (or a prefix) so they do not overwrite each
+other's files:
+
+    analyzer = ImageAnalyzer(path, sink=AsyncDiskSink(f"artifacts/worker-{worker_id}"))
+"""
+import os
+
+import cv2
+import numpy as np
+
+from image_writer import ImageWriter
+
+
+class ArtifactSink:
+    """Base class: write(name, image) stores or discards one named image."""
+
+    def write(self, name, image):
+        raise NotImplementedError
+
+    def flush(self):
+        """Block until every written artifact is stored."""
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class NullSink(ArtifactSink):
+    def write(self, name, image):
+        return None
+
+
+class MemorySink(ArtifactSink):
+    """Keeps the latest image written under every name in self.artifacts."""
+
+    def __init__(self):
+        self.artifacts = {}
+
+    def write(self, name, image):
+        self.artifacts[name] = image
+        return image
+
+
+class DiskSink(ArtifactSink):
+    """Encodes and writes synchronously, like the operators always did."""
+
+    def __init__(self, directory='.', prefix='', params=None):
+        self.directory = directory
+        self.prefix = prefix
+        self.params = params or []
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, self.prefix + name)
+
+    def write(self, name, image):
+        path = self.path(name)
+        if not cv2.imwrite(path, image, self.params):
+            raise IOError(f"Could not write {path}")
+        return path
+
+
+class AsyncDiskSink(DiskSink):
+    """
+    Hands encoding and writing to a background ImageWriter; flush()/close() are the barrier.
+    Each image is copied when it is queued, so callers may reuse or modify it right away.
+    """
+
+    def __init__(self, directory='.', prefix='', params=None, max_workers=1, max_pending=16):
+        super().__init__(directory, prefix, params)
+        self.writer = ImageWriter(max_workers=max_workers, max_pending=max_pending)
+
+    def write(self, name, image):
+        return self.writer.submit(self.path(name), image, self.params, copy=True)
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+
+
+class MemmapSink(DiskSink):
+    """
+    Stores every artifact as a raw .npy file (the image extension is replaced), skipping
+    the encoder. np.load(path, mmap_mode='r') maps it back without reading it all.
+    """
+
+    def path(self, name):
+        return os.path.splitext(super().path(name))[0] + '.npy'
+
+    def write(self, name, image):
+        path = self.path(name)
+        mapped = np.lib.format.open_memmap(path, mode='w+', dtype=image.dtype, shape=image.shape)
+        mapped[...] = image
+        mapped.flush()
+        return path
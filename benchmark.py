@@ -0,0 +1,360 @@
+"""
+Benchmarks every public operation of Perform (and its TransformStack), both ImageProcessor
+classes (and LazyPipeline) and ImageAnalyzer on synthetic images, and compares the numbers
+against a saved baseline.
+
+    python benchmark.py --output bench.json                  # measure
+    python benchmark.py --output baseline.json               # save a baseline
+    python benchmark.py --baseline baseline.json             # fail (exit 1) on regressions
+    python benchmark.py --sizes 256 1024 --filter analyzer   # a quick subset
+
+Each case is timed --repeat times after one warm-up run and reports latency percentiles,
+throughput in megapixels per second and the peak traced allocation of one extra run.
+Operations that write their result to disk do so in a temporary directory. A case that
+raises for an image type is recorded as skipped; against a baseline, a case that was
+measured there but is skipped or gone now fails the comparison like a regression.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+import lab_modules
+
+SIZES = (256, 1024, 4096, 16384)
+DTYPES = ('uint8', 'uint16', 'float32')
+CHANNELS = (1, 3, 4)
+BGR_UINT8 = (('uint8', 3),)
+
+
+def synthetic_image(size, dtype='uint8', channels=3, seed=0):
+    """Deterministic test image: smooth gradients, filled shapes and a little noise."""
+    rng = np.random.default_rng(seed)
+    ramp = np.linspace(0, 255, size, dtype=np.float32)
+    base = (ramp[None, :] * 0.5 + ramp[:, None] * 0.3)
+    img = np.repeat(base[:, :, None], channels, axis=2)
+    step = max(size // 8, 1)
+    for i in range(0, size, step):
+        cv2.circle(img, (i, size - i - 1), step // 3, (255,) * channels, -1)
+        cv2.rectangle(img, (i, i), (i + step // 2, i + step // 4), (0,) * channels, -1)
+    img += rng.normal(0, 8, img.shape).astype(np.float32)
+    np.clip(img, 0, 255, out=img)
+    if dtype == 'uint8':
+        img = img.astype(np.uint8)
+    elif dtype == 'uint16':
+        img = (img * 257).astype(np.uint16)
+    else:
+        img = img / 255
+    return img[:, :, 0].copy() if channels == 1 else img.astype(dtype)
+
+
+def _canvas_cases():
+    Perform = lab_modules.load('1_cv2CanvasShape').Perform
+
+    def drawn_canvas(size):
+        canvas = Perform(size, size)
+        for i, shape in enumerate(Perform.available_shapes()):
+            x, y = (i % 2) * size // 2, (i // 2) * size // 2
+            canvas.make_shape(x + size // 10, y + size // 10, x + size // 2 - size // 10, y + size // 2 - size // 10,
+                              shape_type=shape, color=(0, 255, 0))
+        return canvas
+
+    def make_shape(size, img):
+        canvas = Perform(size, size)
+        return lambda: canvas.make_shape(size // 10, size // 10, size - size // 10, size - size // 10,
+                                         shape_type='triangle')
+
+    def transform(name, *args):
+        def setup(size, img):
+            canvas = drawn_canvas(size)
+            return lambda: getattr(canvas, name)(*args)
+        return setup
+
+    def random_boxes(size, count, seed=0):
+        corners = np.random.default_rng(seed).integers(0, size, (count, 2))
+        extent = np.random.default_rng(seed + 1).integers(size // 50 + 2, size // 10 + 3, (count, 2))
+        return np.hstack([corners, np.minimum(corners + extent, size - 1)])
+
+    def listed_canvas(size, count=1000):
+        canvas = Perform(size, size)
+        canvas.add_shapes(random_boxes(size, count), 'rectangle', (0, 255, 0))
+        canvas.add_shapes(random_boxes(size, count // 4, seed=2), 'triangle', (0, 0, 255), thickness=-1)
+        canvas.render(full=True)
+        return canvas
+
+    def add_remove_shapes(size, img):
+        canvas, boxes = Perform(size, size), random_boxes(size, 1000)
+        return lambda: canvas.remove_shapes(canvas.add_shapes(boxes, 'rectangle', (0, 255, 0)))
+
+    def render_full(size, img):
+        canvas = listed_canvas(size)
+        return lambda: canvas.render(full=True)
+
+    def render_incremental(size, img):
+        # one shape added and removed again: only its region is redrawn, twice
+        canvas, box = listed_canvas(size), random_boxes(size, 1, seed=3)
+
+        def run():
+            canvas.remove_shapes(canvas.add_shapes(box, 'square', (255, 0, 0)))
+            canvas.render()
+        return run
+
+    def stack_apply(size, img):
+        canvas = drawn_canvas(size)
+        return lambda: canvas.transform_stack().rotate(45).scale(1.5, 1.5).translate(10, 0).apply()
+
+    def stack_redraw(size, img):
+        canvas = listed_canvas(size)
+        return lambda: canvas.transform_stack().rotate(45).scale(1.5, 1.5).translate(10, 0).redraw()
+
+    return [
+        ('perform.make_shape', make_shape, BGR_UINT8),
+        ('perform.translate', transform('translate', 10, 10), BGR_UINT8),
+        ('perform.scale', transform('scale', 1.5, 1.5), BGR_UINT8),
+        ('perform.rotate', transform('rotate', 45), BGR_UINT8),
+        ('perform.reflect', transform('reflect', 'horizontal'), BGR_UINT8),
+        ('perform.shear', transform('shear', 0.5, 0.2), BGR_UINT8),
+        ('perform.crop', transform('crop', 10, 10, 200, 150), BGR_UINT8),
+        ('perform.add_remove_shapes', add_remove_shapes, BGR_UINT8),
+        ('perform.render_full', render_full, BGR_UINT8),
+        ('perform.render_incremental', render_incremental, BGR_UINT8),
+        ('transform_stack.apply', stack_apply, BGR_UINT8),
+        ('transform_stack.redraw', stack_redraw, BGR_UINT8),
+    ]
+
+
+def _processor_cases():
+    ImageProcessor = lab_modules.load('2_cv2').ImageProcessor
+    any_image = tuple((dtype, channels) for dtype in DTYPES for channels in CHANNELS)
+
+    def method(name, args):
+        # args(size) builds the call arguments, so they can depend on the image size
+        def setup(size, img):
+            processor = ImageProcessor.from_array(img)
+            call_args = args(size)
+
+            def run():
+                processor.img = img
+                getattr(processor, name)(*call_args)
+            return run
+        return setup
+
+    def pipeline_run(size, img):
+        pipeline = ImageProcessor.from_array(img).pipeline(reorder_blurs=True)
+        pipeline.blur_image('gaussian', (13, 13)).resize_by_scale(0.5, 0.5, 'area').resize_to_dimensions(size // 4, size // 4)
+        return pipeline.run
+
+    def thumbnail(size, img):
+        # run_benchmarks works in a temporary directory
+        path = f"thumbnail_{size}.jpg"
+        cv2.imwrite(path, img)
+        return lambda: ImageProcessor.thumbnail(path, max(size // 8, 1), max(size // 8, 1))
+
+    return [
+        ('processor.resize_to_dimensions', method('resize_to_dimensions', lambda size: (size // 2, size // 2)), any_image),
+        ('processor.resize_by_scale', method('resize_by_scale', lambda size: (0.5, 0.5)), any_image),
+        ('processor.blur_box', method('blur_image', lambda size: ('box', (13, 13))), any_image),
+        ('processor.blur_gaussian', method('blur_image', lambda size: ('gaussian', (13, 13))), any_image),
+        ('processor.blur_adaptive', method('blur_image', lambda size: ('adaptive', (11, 11))), any_image),
+        # background estimation sized kernels, the cost of the last three should not grow with size
+        ('processor.blur_gaussian_large', method('blur_image', lambda size: ('gaussian', (size // 8 | 1,) * 2)), any_image),
+        ('processor.blur_box_integral_large', method('blur_image', lambda size: ('box_integral', (size // 8,) * 2)), any_image),
+        ('processor.blur_gaussian_stacked_large', method('blur_image', lambda size: ('gaussian_stacked', (size // 8,) * 2)), any_image),
+        ('processor.blur_gaussian_pyramid_large', method('blur_image', lambda size: ('gaussian_pyramid', (size // 8,) * 2)), any_image),
+        ('processor.pipeline_run', pipeline_run, any_image),
+        ('processor.thumbnail', thumbnail, BGR_UINT8),
+    ]
+
+
+def _lab_processor_cases():
+    ImageProcessor = lab_modules.load('3_lab').ImageProcessor
+
+    def grayscale(size, img):
+        processor = ImageProcessor.from_array(img)
+        return processor.convert_to_grayscale
+
+    def binary(size, img):
+        processor = ImageProcessor.from_array(img)
+        processor.gray_image = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return processor.convert_to_binary
+
+    def black_pixels(size, img):
+        processor = ImageProcessor.from_array(img)
+        processor.binary_image = cv2.threshold(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), 128, 255, cv2.THRESH_BINARY)[1]
+        return processor.count_black_pixels
+
+    return [
+        ('lab_processor.convert_to_grayscale', grayscale, BGR_UINT8),
+        ('lab_processor.convert_to_binary', binary, BGR_UINT8),
+        ('lab_processor.count_black_pixels', black_pixels, BGR_UINT8),
+    ]
+
+
+def _analyzer_cases():
+    ImageAnalyzer = lab_modules.load('3_lab_task2').ImageAnalyzer
+
+    def method(name):
+        def setup(size, img):
+            analyzer = ImageAnalyzer.from_array(img.copy())
+            return getattr(analyzer, name)
+        return setup
+
+    def tiled(operator):
+        def setup(size, img):
+            analyzer = ImageAnalyzer.from_array(img.copy())
+            return lambda: analyzer.tiled(operator)
+        return setup
+
+    return [('analyzer.' + name, method(name), BGR_UINT8) for name in (
+        'sobel_operator', 'prewitt_operator', 'roberts_operator', 'canny_edge_detection',
+        'global_thresholding', 'adaptive_thresholding', 'watershed_segmentation', 'watershed_regions',
+        'edge_maps',
+    )] + [('analyzer.tiled_' + operator, tiled(operator), BGR_UINT8) for operator in ('sobel', 'canny')]
+
+
+def all_cases():
+    """List of (name, setup, supported (dtype, channels) pairs); setup(size, img) returns the callable to time."""
+    return _canvas_cases() + _processor_cases() + _lab_processor_cases() + _analyzer_cases()
+
+
+def measure(run, repeat, pixels):
+    """Times run() and returns the latency/throughput/memory record of one case."""
+    run()  # warm-up: lazy allocations, OpenCV dispatch, page faults
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    samples = np.array(samples) * 1000
+    p50 = float(np.percentile(samples, 50))
+    return {
+        'repeat': repeat,
+        'mean_ms': float(samples.mean()),
+        'p50_ms': p50,
+        'p90_ms': float(np.percentile(samples, 90)),
+        'p99_ms': float(np.percentile(samples, 99)),
+        'min_ms': float(samples.min()),
+        'megapixels_per_s': pixels / 1e6 / (p50 / 1000) if p50 else float('inf'),
+        'peak_alloc_mb': peak / 2 ** 20,
+    }
+
+
+def run_benchmarks(sizes=SIZES, repeat=5, name_filter=None, log=print):
+    results = {}
+    cases = [case for case in all_cases() if not name_filter or name_filter in case[0]]
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='bench-') as workdir:
+        os.chdir(workdir)
+        try:
+            for size in sizes:
+                images = {}
+                for name, setup, variants in cases:
+                    for dtype, channels in variants:
+                        key = f"{name}/{size}/{dtype}/{channels}"
+                        if (dtype, channels) not in images:
+                            images[(dtype, channels)] = synthetic_image(size, dtype, channels)
+                        try:
+                            with contextlib.redirect_stdout(io.StringIO()):
+                                record = measure(setup(size, images[(dtype, channels)]), repeat, size * size)
+                        except (cv2.error, MemoryError, ValueError) as e:
+                            # kept in the results so compare() can tell a case that stopped working
+                            # from one that never ran on this combination
+                            reason = str(e).strip().splitlines()[-1] if str(e).strip() else type(e).__name__
+                            results[key] = {'skipped': reason}
+                            log(f"{key:<60} skipped: {reason}")
+                            continue
+                        results[key] = record
+                        log(f"{key:<60} p50 {record['p50_ms']:10.3f} ms  p99 {record['p99_ms']:10.3f} ms  "
+                            f"{record['megapixels_per_s']:10.1f} MP/s  peak {record['peak_alloc_mb']:9.1f} MB")
+                del images
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def _selected(key, sizes, name_filter):
+    name, size = key.split('/')[:2]
+    return (sizes is None or int(size) in sizes) and (not name_filter or name_filter in name)
+
+
+def compare(results, baseline, tolerance, sizes=None, name_filter=None):
+    """
+    Compares a run against a baseline.
+
+    :param sizes: Sizes and name_filter of the run, baseline cases outside them are not expected.
+    :return: (regressions, missing): regressions are (key, baseline p50, current p50) of the
+        cases slower than the tolerance allows, missing are (key, reason) of the baseline
+        cases the run should have measured but skipped or no longer has.
+    """
+    regressions, missing = [], []
+    for key, previous in sorted(baseline.items()):
+        if 'skipped' in previous or not _selected(key, sizes, name_filter):
+            continue
+        record = results.get(key)
+        if record is None:
+            missing.append((key, "no such case any more"))
+        elif 'skipped' in record:
+            missing.append((key, record['skipped']))
+        elif record['p50_ms'] > previous['p50_ms'] * (1 + tolerance):
+            regressions.append((key, previous['p50_ms'], record['p50_ms']))
+    return regressions, missing
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'opencv_threads': cv2.getNumThreads(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES), help='square image edge lengths')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per case')
+    parser.add_argument('--filter', default=None, help='only run cases whose name contains this text')
+    parser.add_argument('--output', default='bench_output.json', help='where to write the results')
+    parser.add_argument('--baseline', default=None, help='results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p50 slowdown, 0.25 = 25%%')
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    results = run_benchmarks(args.sizes, args.repeat, args.filter)
+    with open(args.output, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions, missing = compare(results, baseline, args.tolerance, args.sizes, args.filter)
+        for key, before, after in regressions:
+            print(f"REGRESSION {key}: {before:.3f} ms -> {after:.3f} ms ({after / before - 1:+.0%})")
+        for key, reason in missing:
+            print(f"MISSING {key}: {reason}")
+        if regressions or missing:
+            print(f"{len(regressions)} regressions over {args.tolerance:.0%}, {len(missing)} baseline cases not measured")
+            return 1
+        print("No regressions against the baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""
+In-memory compression quality/size sweeps, the many-settings version of compress_image in
+5_lab.ipynb.
+
+The image is decoded once; every candidate setting is then encoded and decoded in memory
+with cv2.imencode/cv2.imdecode on a thread pool (OpenCV releases the GIL while coding), and
+reported with its byte size, encode/decode latency, PSNR and SSIM. Nothing is written to
+edited_images/ and os.path.getsize is not needed. Paths are read as 8-bit BGR like the
+notebook does. Arrays keep their channels and depth where the format can store them; for a
+format that cannot (see FORMAT_DEPTHS) the image is scaled to 8 bits here, by the peak
+value of its type, and that 8-bit image is what gets encoded and measured against. A
+decoded result with other channels than its source (no alpha in JPEG) is converted back
+before it is measured.
+
+    sweep = CompressionSweep('images/original_image.jpeg')
+    for row in sweep.run():
+        print(row)
+    sweep.target_size(20000, 'jpeg')   # best JPEG quality that fits in 20 kB
+"""
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+
+import cv2
+import numpy as np
+
+from image_writer import encoder_params
+
+# format -> (extension, levels swept by default); the level is the quality for JPEG/WebP
+# and the compression level for PNG
+FORMATS = {
+    'jpeg': ('.jpg', (10, 20, 30, 40, 50, 60, 70, 80, 90, 95)),
+    'png': ('.png', tuple(range(10))),
+    'webp': ('.webp', (10, 25, 50, 75, 90, 101)),
+}
+# format -> pixel types its encoder stores as they are; OpenCV saturates anything else to
+# 8 bits instead of scaling it
+FORMAT_DEPTHS = {
+    'jpeg': (np.uint8,),
+    'png': (np.uint8, np.uint16),
+    'webp': (np.uint8,),
+}
+
+
+# (decoded channels, original channels) -> conversion back to the original's layout
+CHANNEL_CONVERSIONS = {
+    (1, 3): cv2.COLOR_GRAY2BGR,
+    (1, 4): cv2.COLOR_GRAY2BGRA,
+    (3, 1): cv2.COLOR_BGR2GRAY,
+    (3, 4): cv2.COLOR_BGR2BGRA,
+    (4, 1): cv2.COLOR_BGRA2GRAY,
+    (4, 3): cv2.COLOR_BGRA2BGR,
+}
+
+
+def peak_value(dtype):
+    """Largest pixel value of an image type: 255 for uint8, 65535 for uint16, 1 for floats."""
+    return float(np.iinfo(dtype).max) if np.issubdtype(dtype, np.integer) else 1.0
+
+
+def _channels(img):
+    return 1 if img.ndim == 2 else img.shape[2]
+
+
+def match_layout(decoded, original):
+    """Converts a decoded image to the channels of the original it was encoded from."""
+    key = (_channels(decoded), _channels(original))
+    if key[0] != key[1]:
+        decoded = cv2.cvtColor(decoded, CHANNEL_CONVERSIONS[key])
+    return decoded
+
+
+def to_uint8(img):
+    """Scales an image of any pixel type to uint8 by the peak value of its type."""
+    if img.dtype == np.uint8:
+        return img
+    return cv2.convertScaleAbs(img, alpha=255 / peak_value(img.dtype))
+
+
+def psnr(original, compressed):
+    """Peak signal-to-noise ratio in dB for the peak value of the image type, inf for identical images."""
+    if np.array_equal(original, compressed):
+        return float('inf')
+    return float(cv2.PSNR(original, compressed, peak_value(original.dtype)))
+
+
+def ssim(original, compressed):
+    """Mean structural similarity (Gaussian window 11x11, sigma 1.5) over all channels."""
+    peak = peak_value(original.dtype)
+    C1, C2 = (0.01 * peak) ** 2, (0.03 * peak) ** 2
+    x = original.astype(np.float32)
+    y = compressed.astype(np.float32)
+
+    def blur(img):
+        return cv2.GaussianBlur(img, (11, 11), 1.5)
+
+    mu_x, mu_y = blur(x), blur(y)
+    mu_xx, mu_yy, mu_xy = mu_x * mu_x, mu_y * mu_y, mu_x * mu_y
+    sigma_x = blur(x * x) - mu_xx
+    sigma_y = blur(y * y) - mu_yy
+    sigma_xy = blur(x * y) - mu_xy
+    ssim_map = ((2 * mu_xy + C1) * (2 * sigma_xy + C2)) / ((mu_xx + mu_yy + C1) * (sigma_x + sigma_y + C2))
+    return float(ssim_map.mean())
+
+
+class CompressionSweep:
+    """Encodes one decoded image across a grid of formats and levels."""
+
+    def __init__(self, image, workers=None):
+        """
+        :param image: Path of the image (read as 8-bit BGR) or an already decoded array.
+        :param workers: Encoder threads (default is the number of cores).
+        """
+        if isinstance(image, str):
+            path, image = image, cv2.imread(image, cv2.IMREAD_COLOR)
+            if image is None:
+                raise FileNotFoundError(f"Image not found at {path}")
+        self.image = image
+        self.image_8bit = to_uint8(image)
+        self.raw_bytes = image.nbytes
+        self.workers = workers or os.cpu_count()
+
+    def encode(self, fmt, level, metrics=True):
+        """
+        Encodes and decodes the image once with one setting. Formats that cannot store the
+        image's pixel type encode (and are measured against) image_8bit.
+
+        :return: Dict with format, level, bytes, ratio (raw/encoded), encode_ms, decode_ms
+            and, when metrics is set, psnr and ssim.
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Invalid format. Choose from {list(FORMATS.keys())}.")
+        ext = FORMATS[fmt][0]
+        if fmt == 'png':
+            params = encoder_params(ext, png_compression=level)
+        else:
+            params = encoder_params(ext, quality=level)
+        source = self.image if self.image.dtype in FORMAT_DEPTHS[fmt] else self.image_8bit
+        start = time.perf_counter()
+        ok, encoded = cv2.imencode(ext, source, params)
+        encode_ms = (time.perf_counter() - start) * 1000
+        if not ok:
+            raise ValueError(f"Could not encode as {fmt} at level {level}")
+        start = time.perf_counter()
+        decoded = cv2.imdecode(encoded, cv2.IMREAD_UNCHANGED)
+        decode_ms = (time.perf_counter() - start) * 1000
+        result = {
+            'format': fmt,
+            'level': level,
+            'bytes': int(encoded.size),
+            'ratio': self.raw_bytes / encoded.size,
+            'encode_ms': encode_ms,
+            'decode_ms': decode_ms,
+        }
+        if metrics:
+            decoded = match_layout(decoded, source)
+            result['psnr'] = psnr(source, decoded)
+            result['ssim'] = ssim(source, decoded)
+        return result
+
+    def run(self, grid=None, metrics=True):
+        """
+        Sweeps a grid of settings in parallel.
+
+        :param grid: Dict of format -> levels, defaults to every format in FORMATS.
+        :param metrics: Compute PSNR/SSIM (the most expensive part for big images).
+        :return: List of result dicts (see encode), sorted by size.
+        """
+        grid = grid or {fmt: levels for fmt, (_, levels) in FORMATS.items()}
+        jobs = [(fmt, level) for fmt, levels in grid.items() for level in levels]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(lambda job: self.encode(*job, metrics=metrics), jobs))
+        return sorted(results, key=lambda r: r['bytes'])
+
+    def target_size(self, max_bytes, fmt='jpeg', metrics=True):
+        """
+        Binary-searches the highest JPEG/WebP quality whose output fits in max_bytes.
+
+        Size grows (almost always monotonically) with quality, so this needs about 7
+        encodes instead of 100.
+
+        :return: The result dict of the chosen quality, or None if even quality 1 is too big.
+        """
+        if fmt not in ('jpeg', 'webp'):
+            raise ValueError("Target size search needs a quality based format: 'jpeg' or 'webp'.")
+        low, high, best = 1, 100, None
+        while low <= high:
+            quality = (low + high) // 2
+            result = self.encode(fmt, quality, metrics=False)
+            if result['bytes'] <= max_bytes:
+                best, low = quality, quality + 1
+            else:
+                high = quality - 1
+        if best is None:
+            return None
+        return self.encode(fmt, best, metrics=metrics)
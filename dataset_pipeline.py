@@ -0,0 +1,271 @@
+"""
+Streaming uint8 data pipeline for the MNIST and CIFAR-10 models of 5_lab.ipynb.
+
+prepare_mnist_data/prepare_cifar10_data in the notebook convert both splits to float32
+(4x the uint8 size) and one-hot encode every label before training. Here the splits are
+cached once as uint8 .npy files and opened memory-mapped, so only the pages a batch
+touches are read. BatchStream shuffles indices, gathers each mini-batch, normalises it
+and one-hot encodes its labels on background threads, a few batches ahead of the model.
+evaluate_stream replaces evaluate_model: predictions are consumed batch by batch into
+a confusion matrix and binned per-class score histograms, which give
+precision/recall/F1 and ROC curves without holding all predictions in memory.
+
+    x_train, y_train, x_test, y_test = prepare_mnist_data()
+    train, validation = train_validation_streams(x_train, y_train, batch_size=64)
+    model.fit(train.repeat(), steps_per_epoch=len(train), epochs=50,
+              validation_data=validation.repeat(), validation_steps=len(validation))
+    evaluate_stream(model, x_test, y_test)
+
+keras is only imported when a dataset has to be downloaded into the cache.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+import numpy as np
+
+# name -> image shape of one sample
+DATASETS = {
+    'mnist': (28, 28, 1),
+    'cifar10': (32, 32, 3),
+}
+SPLITS = ('x_train', 'y_train', 'x_test', 'y_test')
+CACHE_DIR = os.environ.get('DATASET_CACHE_DIR', 'datasets')
+WRITE_CHUNK = 10000
+
+
+def cache_dataset(name, cache_dir=CACHE_DIR):
+    """
+    Memory-mapped uint8 copies of a keras dataset, downloaded and written on first use.
+
+    :param name: One of DATASETS.
+    :param cache_dir: Directory holding one sub-directory of .npy files per dataset.
+    :return: Dict of split name (see SPLITS) -> read-only memmap. Images are (N, H, W, C)
+        uint8, labels a flat uint8 vector.
+    """
+    if name not in DATASETS:
+        raise ValueError(f"Invalid dataset. Choose from {list(DATASETS.keys())}.")
+    directory = os.path.join(cache_dir, name)
+    paths = {split: os.path.join(directory, split + '.npy') for split in SPLITS}
+    if not all(os.path.exists(path) for path in paths.values()):
+        _write_cache(name, directory, paths)
+    return {split: np.load(path, mmap_mode='r') for split, path in paths.items()}
+
+
+def _write_cache(name, directory, paths):
+    from keras import datasets
+
+    (x_train, y_train), (x_test, y_test) = getattr(datasets, name).load_data()
+    os.makedirs(directory, exist_ok=True)
+    arrays = {
+        'x_train': x_train.reshape((len(x_train),) + DATASETS[name]),
+        'y_train': y_train.reshape(-1),
+        'x_test': x_test.reshape((len(x_test),) + DATASETS[name]),
+        'y_test': y_test.reshape(-1),
+    }
+    for split, array in arrays.items():
+        # write under a temporary name so an interrupted download is not taken as a cache
+        partial = paths[split] + '.partial'
+        mapped = np.lib.format.open_memmap(partial, mode='w+', dtype=np.uint8, shape=array.shape)
+        for start in range(0, len(array), WRITE_CHUNK):
+            mapped[start:start + WRITE_CHUNK] = array[start:start + WRITE_CHUNK]
+        mapped.flush()
+        del mapped
+        os.replace(partial, paths[split])
+
+
+def prepare_mnist_data(cache_dir=CACHE_DIR):
+    """MNIST as uint8 memmaps: x_train, y_train, x_test, y_test (labels as class indices)."""
+    data = cache_dataset('mnist', cache_dir)
+    return tuple(data[split] for split in SPLITS)
+
+
+def prepare_cifar10_data(cache_dir=CACHE_DIR):
+    """CIFAR-10 as uint8 memmaps: x_train, y_train, x_test, y_test (labels as class indices)."""
+    data = cache_dataset('cifar10', cache_dir)
+    return tuple(data[split] for split in SPLITS)
+
+
+class BatchStream:
+    """
+    Mini-batches of normalised images and one-hot labels, prepared ahead on threads.
+
+    Only `prefetch` batches exist as float32 at any time. Indices inside a batch are
+    sorted before gathering, so reads from a memmap go forward through the file.
+    """
+
+    def __init__(self, x, y, batch_size=64, num_classes=10, shuffle=True, seed=None,
+                 indices=None, prefetch=4, workers=2, one_hot=True):
+        """
+        :param x: (N, ...) uint8 images, typically a memmap from cache_dataset.
+        :param y: (N,) integer class labels.
+        :param batch_size: Samples per batch; the last batch may be smaller.
+        :param num_classes: Width of the one-hot labels.
+        :param shuffle: Draw a new permutation every epoch.
+        :param seed: Seed of the shuffling generator.
+        :param indices: Subset of sample indices to stream, default is all of them.
+        :param prefetch: Batches prepared ahead of the consumer.
+        :param workers: Threads preparing batches (numpy releases the GIL while copying).
+        :param one_hot: Yield one-hot float32 labels, otherwise the integer labels.
+        """
+        self.x = x
+        self.y = y
+        self.batch_size = batch_size
+        self.num_classes = num_classes
+        self.shuffle = shuffle
+        self.indices = np.arange(len(x)) if indices is None else np.asarray(indices)
+        self.prefetch = max(prefetch, 1)
+        self.workers = workers
+        self.one_hot = one_hot
+        self._rng = np.random.default_rng(seed)
+        self._eye = np.eye(num_classes, dtype=np.float32)
+
+    def __len__(self):
+        return -(-len(self.indices) // self.batch_size)
+
+    def __iter__(self):
+        """One epoch of (images, labels) batches."""
+        order = self._rng.permutation(self.indices) if self.shuffle else self.indices
+        batches = (np.sort(order[start:start + self.batch_size])
+                   for start in range(0, len(order), self.batch_size))
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = deque()
+            for batch in batches:
+                pending.append(pool.submit(self._make_batch, batch))
+                if len(pending) >= self.prefetch:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def repeat(self, epochs=None):
+        """Batches of several epochs (forever by default), e.g. for keras' fit with steps_per_epoch."""
+        epoch = 0
+        while epochs is None or epoch < epochs:
+            yield from self
+            epoch += 1
+
+    def _make_batch(self, batch):
+        images = np.multiply(self.x[batch], np.float32(1 / 255), dtype=np.float32)
+        labels = np.asarray(self.y[batch]).reshape(-1)
+        if self.one_hot:
+            labels = self._eye[labels]
+        return images, labels
+
+
+def train_validation_streams(x, y, validation_split=0.2, batch_size=64, **kwargs):
+    """
+    Training and validation streams split like keras' validation_split: the last
+    validation_split of the samples, before shuffling, are held out.
+
+    :return: (train, validation) BatchStreams; the validation stream is not shuffled.
+    """
+    split = int(len(x) * (1 - validation_split))
+    indices = np.arange(len(x))
+    train = BatchStream(x, y, batch_size, indices=indices[:split], **kwargs)
+    kwargs['shuffle'] = False
+    validation = BatchStream(x, y, batch_size, indices=indices[split:], **kwargs)
+    return train, validation
+
+
+class StreamingMetrics:
+    """
+    Classification metrics accumulated batch by batch.
+
+    Keeps a num_classes x num_classes confusion matrix and, per class, histograms of the
+    predicted score of positive and negative samples over `bins` equal-width bins. ROC
+    curves are read off the histograms at the bin edges, so they are exact up to the
+    score resolution of 1 / bins.
+    """
+
+    def __init__(self, num_classes=10, bins=1000):
+        self.num_classes = num_classes
+        self.bins = bins
+        self.confusion = np.zeros((num_classes, num_classes), dtype=np.int64)
+        self.positive = np.zeros((num_classes, bins), dtype=np.int64)
+        self.negative = np.zeros((num_classes, bins), dtype=np.int64)
+
+    def update(self, labels, scores):
+        """
+        :param labels: (B,) integer class labels, or (B, num_classes) one-hot labels.
+        :param scores: (B, num_classes) predicted class probabilities.
+        """
+        labels = np.asarray(labels)
+        if labels.ndim == 2:
+            labels = labels.argmax(axis=1)
+        # uint8 labels (as cached) would overflow labels * k from 16 classes on
+        labels = labels.astype(np.int64)
+        scores = np.asarray(scores)
+        k = self.num_classes
+        predicted = scores.argmax(axis=1)
+        self.confusion += np.bincount(labels * k + predicted, minlength=k * k).reshape(k, k)
+        binned = np.clip((scores * self.bins).astype(np.int64), 0, self.bins - 1)
+        flat = binned + np.arange(k) * self.bins
+        is_positive = labels[:, None] == np.arange(k)
+        size = k * self.bins
+        self.positive += np.bincount(flat[is_positive], minlength=size).reshape(k, self.bins)
+        self.negative += np.bincount(flat[~is_positive], minlength=size).reshape(k, self.bins)
+
+    def precision_recall_f1(self):
+        """Per-class precision, recall, F1 and support, 0 where undefined (like sklearn)."""
+        true_positive = np.diag(self.confusion).astype(np.float64)
+        predicted = self.confusion.sum(axis=0)
+        support = self.confusion.sum(axis=1)
+        precision = np.divide(true_positive, predicted, out=np.zeros(self.num_classes), where=predicted > 0)
+        recall = np.divide(true_positive, support, out=np.zeros(self.num_classes), where=support > 0)
+        total = precision + recall
+        f1 = np.divide(2 * precision * recall, total, out=np.zeros(self.num_classes), where=total > 0)
+        return precision, recall, f1, support
+
+    def roc(self):
+        """
+        :return: (fpr, tpr, auc): fpr and tpr are (num_classes, bins + 1) arrays from the
+            highest threshold down, auc is (num_classes,).
+        """
+        def rates(hist):
+            cumulative = np.cumsum(hist[:, ::-1], axis=1)
+            totals = np.maximum(cumulative[:, -1:], 1)
+            zeros = np.zeros((self.num_classes, 1))
+            return np.hstack([zeros, cumulative / totals])
+
+        fpr, tpr = rates(self.negative), rates(self.positive)
+        auc = np.sum(np.diff(fpr, axis=1) * (tpr[:, 1:] + tpr[:, :-1]) / 2, axis=1)
+        return fpr, tpr, auc
+
+    def result(self):
+        """Weighted precision/recall/F1 (as evaluate_model), per-class values, confusion and ROC."""
+        precision, recall, f1, support = self.precision_recall_f1()
+        weights = support / max(support.sum(), 1)
+        fpr, tpr, auc = self.roc()
+        return {
+            'precision': float(precision @ weights),
+            'recall': float(recall @ weights),
+            'f1': float(f1 @ weights),
+            'per_class': {'precision': precision, 'recall': recall, 'f1': f1, 'support': support},
+            'confusion_matrix': self.confusion.copy(),
+            'roc': {'fpr': fpr, 'tpr': tpr, 'auc': auc},
+        }
+
+
+def evaluate_stream(model, x, y, batch_size=256, num_classes=10, bins=1000, **kwargs):
+    """
+    Streaming version of evaluate_model: predicts batch by batch and prints the metrics.
+
+    :param model: A keras model (predict_on_batch is used) or any callable returning class
+        probabilities for a batch of normalised images.
+    :param x: uint8 images, a memmap is fine.
+    :param y: Integer (or one-hot) labels.
+    :param kwargs: Passed on to BatchStream, e.g. prefetch or workers.
+    :return: The StreamingMetrics.result() dict.
+    """
+    predict = getattr(model, 'predict_on_batch', model)
+    metrics = StreamingMetrics(num_classes, bins)
+    if np.ndim(y) == 2 and np.shape(y)[1] == num_classes:
+        y = np.argmax(y, axis=1)
+    stream = BatchStream(x, y, batch_size, num_classes, shuffle=False, one_hot=False, **kwargs)
+    for images, labels in stream:
+        metrics.update(labels, np.asarray(predict(images)))
+    result = metrics.result()
+    print(f"Precision: {result['precision']:.4f}")
+    print(f"Recall: {result['recall']:.4f}")
+    print(f"F1-Score: {result['f1']:.4f}")
+    return result
@@ -0,0 +1,252 @@
+"""
+In-process object detection service with dynamic batching.
+
+The detection cell of 6_lab.ipynb runs fasterrcnn_resnet50_fpn on one CIFAR image at a
+time through transforms.ToTensor(). Here callers submit images from any thread and get a
+Future back. A single inference thread groups waiting requests into a batch of at most
+max_batch_size images, waiting at most max_wait seconds for the batch to fill after the
+first request arrives. Images of the same shape are converted to tensors together (one
+stack and one division instead of a ToTensor call each), and the model runs once per batch.
+
+    with DetectionService(max_batch_size=8, max_wait=0.01) as service:
+        futures = [service.submit(image) for image in cifar_images]
+        detections = [future.result() for future in futures]
+        print(service.metrics())
+
+torch and torchvision are only imported by start(), so importing this module is cheap.
+"""
+from collections import deque
+from concurrent.futures import Future
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+_STOP = object()
+
+
+class DetectionService:
+    """Dynamic-batching wrapper around a torchvision detection model."""
+
+    def __init__(self, model=None, max_batch_size=8, max_wait=0.01, num_threads=None,
+                 score_threshold=0.5, max_queue=256, warmup_size=(32, 32), window=10000):
+        """
+        :param model: Detection model taking a list of CHW float tensors and returning a list
+            of dicts with boxes, labels and scores, as torchvision's detection models do.
+            Defaults to a pretrained fasterrcnn_resnet50_fpn, loaded by start().
+        :param max_batch_size: Largest number of images run through the model at once.
+        :param max_wait: Seconds the first request of a batch may wait for more requests.
+        :param num_threads: torch intra-op threads (default is the number of cores).
+        :param score_threshold: Detections below this score are dropped.
+        :param max_queue: Pending requests before submit() blocks.
+        :param warmup_size: (height, width) of the dummy images of the warm-up batch.
+        :param window: Number of recent requests and batches kept for the metrics.
+        """
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.num_threads = num_threads or os.cpu_count()
+        self.score_threshold = score_threshold
+        self.warmup_size = warmup_size
+        self.requests = queue.Queue(maxsize=max_queue)
+        self._torch = None
+        self._worker = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._waits = deque(maxlen=window)
+        self._batch_sizes = deque(maxlen=window)
+        self._inference_times = deque(maxlen=window)
+        self._completed = 0
+        self._failed = 0
+        self._started = None
+
+    def start(self, warmup=True):
+        """
+        Loads the model, tunes torch threading, runs a warm-up batch and starts serving.
+
+        The warm-up batch pays for lazy weight initialisation, allocator growth and kernel
+        selection before the first real request does.
+        """
+        if self._worker is not None:
+            return self
+        import torch
+
+        self._torch = torch
+        torch.set_num_threads(self.num_threads)
+        try:
+            # batches are already parallel inside every op; extra inter-op threads only compete
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # can only be set once per process, before any parallel work
+        if self.model is None:
+            self.model = _load_default_model()
+        if hasattr(self.model, 'eval'):
+            self.model.eval()
+        if warmup:
+            height, width = self.warmup_size
+            self._infer([np.zeros((height, width, 3), np.uint8)] * self.max_batch_size)
+        self._started = time.perf_counter()
+        self._worker = threading.Thread(target=self._serve, name='detection-service', daemon=True)
+        self._worker.start()
+        return self
+
+    def submit(self, image):
+        """
+        Queues one image for detection. Cancelling the future before its batch starts
+        drops the image.
+
+        :param image: RGB uint8 array of shape (H, W, 3), or grayscale (H, W).
+        :return: Future resolving to a dict with 'boxes' (N, 4) as x1, y1, x2, y2, 'labels'
+            (N,) and 'scores' (N,) numpy arrays.
+        """
+        if self._worker is None:
+            raise RuntimeError("Service not started. Call start() first.")
+        future = Future()
+        self.requests.put((image, future, time.perf_counter()))
+        return future
+
+    def detect(self, image, timeout=None):
+        """Blocking single-image detection through the batching queue."""
+        return self.submit(image).result(timeout)
+
+    def detect_many(self, images, timeout=None):
+        """Submits all images at once so they share batches, returns results in order."""
+        futures = [self.submit(image) for image in images]
+        return [future.result(timeout) for future in futures]
+
+    def stop(self):
+        """Serves the requests already queued, then stops the inference thread."""
+        if self._worker is None:
+            return
+        self.requests.put(_STOP)
+        self._worker.join()
+        self._worker = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def metrics(self):
+        """
+        Latency and batching statistics over the recent window.
+
+        :return: Dict with completed and failed request counts, throughput in images/s since
+            start(), latency and queue wait percentiles in ms, mean batch size, batch
+            occupancy (mean batch size / max_batch_size) and mean model time per batch.
+        """
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            waits = np.array(self._waits) * 1000
+            batch_sizes = np.array(self._batch_sizes)
+            inference = np.array(self._inference_times) * 1000
+            completed, failed = self._completed, self._failed
+        elapsed = time.perf_counter() - self._started if self._started else 0
+
+        def percentiles(values):
+            if not len(values):
+                return {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            return {'mean': float(values.mean()), 'p50': float(p50), 'p95': float(p95), 'p99': float(p99)}
+
+        mean_batch = float(batch_sizes.mean()) if len(batch_sizes) else 0.0
+        return {
+            'completed': completed,
+            'failed': failed,
+            'images_per_s': completed / elapsed if elapsed > 0 else 0.0,
+            'latency_ms': percentiles(latencies),
+            'queue_wait_ms': percentiles(waits),
+            'batches': len(batch_sizes),
+            'mean_batch_size': mean_batch,
+            'batch_occupancy': mean_batch / self.max_batch_size,
+            'inference_ms_per_batch': float(inference.mean()) if len(inference) else 0.0,
+        }
+
+    def _serve(self):
+        while True:
+            item = self.requests.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = item[2] + self.max_wait
+            stopping = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._run_batch(batch)
+            if stopping:
+                return
+
+    def _run_batch(self, batch):
+        # a future cancelled while queued is dropped; the others can no longer be cancelled
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        images = [image for image, _, _ in batch]
+        start = time.perf_counter()
+        try:
+            results = self._infer(images)
+            if len(results) != len(batch):
+                raise RuntimeError(f"Model returned {len(results)} results for {len(batch)} images")
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            with self._lock:
+                self._failed += len(batch)
+            return
+        done = time.perf_counter()
+        with self._lock:
+            self._batch_sizes.append(len(batch))
+            self._inference_times.append(done - start)
+            for _, _, submitted in batch:
+                self._waits.append(start - submitted)
+                self._latencies.append(done - submitted)
+            self._completed += len(batch)
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def _infer(self, images):
+        torch = self._torch
+        with torch.inference_mode():
+            outputs = self.model(self._to_tensors(images))
+        results = []
+        for output in outputs:
+            keep = output['scores'] >= self.score_threshold
+            results.append({key: output[key][keep].numpy() for key in ('boxes', 'labels', 'scores')})
+        return results
+
+    def _to_tensors(self, images):
+        """Same as transforms.ToTensor() per image, but one conversion per image shape."""
+        torch = self._torch
+        tensors = [None] * len(images)
+        groups = {}
+        for index, image in enumerate(images):
+            if image.ndim == 2:
+                image = np.repeat(image[:, :, None], 3, axis=2)
+            groups.setdefault(image.shape, []).append((index, image))
+        for members in groups.values():
+            stacked = torch.from_numpy(np.stack([image for _, image in members]))
+            batch = stacked.permute(0, 3, 1, 2).float().div_(255)
+            for (index, _), tensor in zip(members, batch):
+                tensors[index] = tensor
+        return tensors
+
+
+def _load_default_model():
+    from torchvision.models.detection import fasterrcnn_resnet50_fpn
+
+    try:
+        return fasterrcnn_resnet50_fpn(weights='DEFAULT')
+    except TypeError:
+        # torchvision before 0.13, as used in 6_lab.ipynb
+        return fasterrcnn_resnet50_fpn(pretrained=True)
@@ -0,0 +1,176 @@
+"""
+Streaming per-channel and luminance histograms.
+
+A streaming version of analyze_histogram from 4_lab.ipynb. Instead of one cv2.calcHist
+call per channel plus a grayscale conversion and a luminance calcHist over the whole
+image, every image is walked in cache-sized row chunks and each chunk is read by a single
+calcHist call: the interleaved pixels are paired with a constant plane holding each
+sample's channel index, so the 2D (value, channel) histogram is all channel histograms at
+once. The luminance histogram comes from the grayscale conversion of the same chunk while
+it is still in cache. Accumulators merge across workers and tiles, SlidingHistogram keeps
+a moving window over video frames, and results persist as compact .npz arrays.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import os
+
+import cv2
+import numpy as np
+
+# bytes of image rows histogrammed at a time, small enough to stay in a per-core L2 cache
+CHUNK_BYTES = 256 * 1024
+
+
+@functools.lru_cache(maxsize=16)
+def _channel_index(rows, width, channels):
+    # channel of every interleaved sample of a (rows, width, channels) chunk
+    index = np.tile(np.arange(channels, dtype=np.uint8), (rows, width))
+    index.flags.writeable = False
+    return index
+
+
+def image_histogram(img, bins=256, chunk_bytes=CHUNK_BYTES):
+    """
+    Histograms of every channel and of the luminance of one uint8 image.
+
+    :param img: Grayscale (H, W), BGR (H, W, 3) or BGRA (H, W, 4) uint8 image.
+    :param bins: Number of bins over [0, 256).
+    :param chunk_bytes: Bytes of rows processed at a time, small enough for the chunk to stay in cache.
+    :return: int64 array of shape (channels + 1, bins), the last row is the luminance histogram.
+    """
+    rows_per_chunk = max(1, chunk_bytes // (img.strides[0] or 1))
+    if img.ndim == 2:
+        hist = np.zeros((2, bins), dtype=np.int64)
+        for start in range(0, img.shape[0], rows_per_chunk):
+            chunk = img[start:start + rows_per_chunk]
+            hist[0] += cv2.calcHist([chunk], [0], None, [bins], [0, 256]).ravel().astype(np.int64)
+        hist[1] = hist[0]
+        return hist
+    channels = img.shape[2]
+    to_gray = cv2.COLOR_BGR2GRAY if channels == 3 else cv2.COLOR_BGRA2GRAY
+    hist = np.zeros((channels + 1, bins), dtype=np.int64)
+    for start in range(0, img.shape[0], rows_per_chunk):
+        chunk = img[start:start + rows_per_chunk]
+        samples = chunk.reshape(chunk.shape[0], -1)
+        channel_index = _channel_index(chunk.shape[0], chunk.shape[1], channels)
+        joint = cv2.calcHist([samples, channel_index], [0, 1], None, [bins, channels], [0, 256, 0, channels])
+        hist[:channels] += joint.T.astype(np.int64)
+        gray = cv2.cvtColor(chunk, to_gray)
+        hist[channels] += cv2.calcHist([gray], [0], None, [bins], [0, 256]).ravel().astype(np.int64)
+    return hist
+
+
+class HistogramAccumulator:
+    """
+    Sums image histograms over a stream of frames, tiles or files.
+
+    Accumulators built on different workers or tiles combine with merge() (or +=),
+    the result is the same as accumulating everything in one place.
+    """
+
+    def __init__(self, channels=3, bins=256):
+        self.channels = channels
+        self.bins = bins
+        self.counts = np.zeros((channels + 1, bins), dtype=np.int64)
+        self.frames = 0
+
+    def update(self, img):
+        """Adds one image (or tile) and returns its own histogram."""
+        hist = image_histogram(img, self.bins)
+        if hist.shape != self.counts.shape:
+            raise ValueError(f"Expected {self.channels} channel images, got {hist.shape[0] - 1}")
+        self.counts += hist
+        self.frames += 1
+        return hist
+
+    def merge(self, other):
+        """Adds the counts of another accumulator with the same layout."""
+        if other.counts.shape != self.counts.shape:
+            raise ValueError("Cannot merge histograms with different channels or bins")
+        self.counts += other.counts
+        self.frames += other.frames
+        return self
+
+    __iadd__ = merge
+
+    @property
+    def luminance(self):
+        return self.counts[-1]
+
+    def channel(self, index):
+        return self.counts[index]
+
+    def pixels(self):
+        return int(self.counts[-1].sum())
+
+    def mean(self):
+        """Mean value per row (channels, then luminance)."""
+        centers = (np.arange(self.bins) + 0.5) * (256 / self.bins)
+        totals = self.counts.sum(axis=1)
+        return np.divide(self.counts @ centers, totals, out=np.zeros(len(totals)), where=totals > 0)
+
+    def percentile(self, q):
+        """Approximate q-th percentile per row, at bin resolution."""
+        cumulative = np.cumsum(self.counts, axis=1)
+        targets = cumulative[:, -1:] * (q / 100)
+        return (cumulative < targets).sum(axis=1) * (256 / self.bins)
+
+    def save(self, path):
+        """Writes the counts to a compressed .npz, using uint32 when the counts fit."""
+        dtype = np.uint32 if self.counts.max(initial=0) < 2 ** 32 else np.uint64
+        np.savez_compressed(path, counts=self.counts.astype(dtype), frames=self.frames)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        counts = data['counts'].astype(np.int64)
+        accumulator = cls(channels=counts.shape[0] - 1, bins=counts.shape[1])
+        accumulator.counts = counts
+        accumulator.frames = int(data['frames'])
+        return accumulator
+
+
+class SlidingHistogram(HistogramAccumulator):
+    """
+    Histogram over the last `window` frames of a video stream.
+
+    push() adds the new frame and subtracts the one falling out of the window, so each
+    update costs one frame histogram, independent of the window length.
+    """
+
+    def __init__(self, window, channels=3, bins=256):
+        super().__init__(channels, bins)
+        self.window = window
+        self._history = deque()
+
+    def push(self, frame):
+        hist = self.update(frame)
+        self._history.append(hist)
+        if len(self._history) > self.window:
+            self.counts -= self._history.popleft()
+            self.frames -= 1
+        return self.counts
+
+
+def accumulate_files(paths, channels=3, bins=256, workers=None):
+    """
+    Histograms of many image files, decoded and counted on a thread pool.
+
+    Each worker returns per-image histograms that are merged into one accumulator, so
+    only a few decoded images are alive at any time.
+    """
+    flags = cv2.IMREAD_GRAYSCALE if channels == 1 else cv2.IMREAD_COLOR
+
+    def histogram_of(path):
+        img = cv2.imread(path, flags)
+        if img is None:
+            raise FileNotFoundError(f"Image not found at {path}")
+        return image_histogram(img, bins)
+
+    accumulator = HistogramAccumulator(channels, bins)
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for hist in pool.map(histogram_of, paths):
+            accumulator.counts += hist
+            accumulator.frames += 1
+    return accumulator
@@ -0,0 +1,127 @@
+"""
+Hough line and circle detection for single images and whole image arrays.
+
+The Hough cells of 6_lab.ipynb call skimage's hough_circle with one full accumulator per
+radius in np.arange(10, 50, 2) and then hough_line on the Canny edges. Here circles use
+cv2.HoughCircles with HOUGH_GRADIENT: every edge pixel votes only along its gradient
+direction into a single centre accumulator shared by all radii, and the radius is found
+per candidate centre afterwards, so memory does not grow with the radius range. Lines
+use the probabilistic transform (cv2.HoughLinesP), which returns segments directly.
+
+    circles = detect_circles(test_images[5], min_radius=10, max_radius=50)
+    results = detect_batch(test_images, 'lines', workers=8)
+"""
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+import cv2
+import numpy as np
+
+DETECTORS = ('circles', 'lines')
+# images handed to one thread at a time; small images are cheap, so the per-task
+# overhead of the pool would dominate with one image per task
+CHUNK_SIZE = 256
+
+
+def _as_uint8(image):
+    """Grayscale uint8 view of an image; floats in [0, 1] are scaled to [0, 255]."""
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY if image.shape[2] == 3 else cv2.COLOR_BGRA2GRAY)
+    if image.dtype == np.uint8:
+        return image
+    if np.issubdtype(image.dtype, np.floating) and image.max(initial=0) <= 1:
+        image = image * 255
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def _smooth(image, sigma):
+    return cv2.GaussianBlur(image, (0, 0), sigma) if sigma > 0 else image
+
+
+def detect_circles(image, min_radius=10, max_radius=50, min_dist=None, canny_high=100,
+                   votes=20, max_circles=None, sigma=1.5, dp=1):
+    """
+    Circles by gradient-direction voting (cv2.HoughCircles, HOUGH_GRADIENT).
+
+    :param image: Grayscale or BGR image, uint8 or float in [0, 1].
+    :param min_radius: Smallest radius in pixels; the whole range shares one accumulator.
+    :param max_radius: Largest radius in pixels.
+    :param min_dist: Minimum distance between centres, defaults to min_radius.
+    :param canny_high: Upper Canny threshold of the internal edge detector (the lower one is half).
+    :param votes: Accumulator votes a centre needs; lower finds more (and more false) circles.
+    :param max_circles: Keep only the strongest circles.
+    :param sigma: Gaussian smoothing before edge detection, like skimage's canny(sigma=1.5).
+    :param dp: Inverse accumulator resolution, 2 halves the accumulator in each direction.
+    :return: float32 array of shape (N, 3) with x, y, radius, strongest first.
+    """
+    gray = _smooth(_as_uint8(image), sigma)
+    circles = cv2.HoughCircles(gray, cv2.HOUGH_GRADIENT, dp, min_dist or max(min_radius, 1),
+                               param1=canny_high, param2=votes,
+                               minRadius=min_radius, maxRadius=max_radius)
+    if circles is None:
+        return np.empty((0, 3), np.float32)
+    # (1, N, 3) in most OpenCV versions, (N, 3) in some
+    return circles.reshape(-1, 3)[:max_circles]
+
+
+def detect_lines(image, threshold=20, min_length=10, max_gap=3, canny_thresholds=(50, 150),
+                 sigma=1.5, rho=1, theta=np.pi / 180):
+    """
+    Line segments by the probabilistic Hough transform on Canny edges (cv2.HoughLinesP).
+
+    :param image: Grayscale or BGR image, uint8 or float in [0, 1].
+    :param threshold: Accumulator votes a line needs.
+    :param min_length: Shortest segment returned, in pixels.
+    :param max_gap: Largest gap between edge points joined into one segment.
+    :param canny_thresholds: (low, high) thresholds of the edge detector.
+    :param sigma: Gaussian smoothing before edge detection.
+    :param rho: Accumulator distance resolution in pixels.
+    :param theta: Accumulator angle resolution in radians.
+    :return: int32 array of shape (N, 4) with x1, y1, x2, y2 per segment.
+    """
+    edges = cv2.Canny(_smooth(_as_uint8(image), sigma), *canny_thresholds)
+    lines = cv2.HoughLinesP(edges, rho, theta, threshold, minLineLength=min_length, maxLineGap=max_gap)
+    if lines is None:
+        return np.empty((0, 4), np.int32)
+    return lines.reshape(-1, 4)
+
+
+def detect_batch(images, detector='circles', workers=None, chunk_size=CHUNK_SIZE, **params):
+    """
+    Runs a detector over many images on a thread pool (OpenCV releases the GIL).
+
+    :param images: Array of shape (N, H, W) such as the Fashion-MNIST test set, or a list of images.
+    :param detector: 'circles' (detect_circles) or 'lines' (detect_lines).
+    :param workers: Number of threads (default is the number of cores).
+    :param chunk_size: Images per task.
+    :param params: Passed on to the detector.
+    :return: List with one result array per image, in input order.
+    """
+    if detector not in DETECTORS:
+        raise ValueError(f"Invalid detector. Choose from {list(DETECTORS)}.")
+    detect = detect_circles if detector == 'circles' else detect_lines
+
+    def run_chunk(start):
+        return [detect(image, **params) for image in images[start:start + chunk_size]]
+
+    results = []
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for chunk in pool.map(run_chunk, range(0, len(images), chunk_size)):
+            results.extend(chunk)
+    return results
+
+
+def draw_circles(image, circles, color=(20, 20, 220), thickness=1):
+    """Returns a BGR copy of image with the circles of detect_circles drawn on it."""
+    canvas = cv2.cvtColor(_as_uint8(image), cv2.COLOR_GRAY2BGR)
+    for x, y, radius in np.round(circles).astype(int):
+        cv2.circle(canvas, (x, y), radius, color, thickness)
+    return canvas
+
+
+def draw_lines(image, lines, color=(20, 20, 220), thickness=1):
+    """Returns a BGR copy of image with the segments of detect_lines drawn on it."""
+    canvas = cv2.cvtColor(_as_uint8(image), cv2.COLOR_GRAY2BGR)
+    for x1, y1, x2, y2 in lines:
+        cv2.line(canvas, (int(x1), int(y1)), (int(x2), int(y2)), color, thickness)
+    return canvas
@@ -0,0 +1,99 @@
+"""
+Process-wide cache of decoded images.
+
+ImageProcessor (2_cv2.py, 3_lab.py) and ImageAnalyzer (3_lab_task2.py) read their images
+through imread() below, so several processors and analyzers working on the same file in
+one process share a single decode. Entries are keyed by path, modification time, size
+and read flags, so a changed file is decoded again. The cache is a least-recently-used
+list bounded by a byte budget (IMAGE_CACHE_BYTES environment variable, 512 MiB by
+default). Cached arrays are returned as read-only views of the stored array, and since
+the stored array itself is read-only no caller can turn a view writable again: code that
+wants to modify an image in place must copy it first.
+"""
+from collections import OrderedDict
+import os
+import threading
+
+import cv2
+
+DEFAULT_MAX_BYTES = int(os.environ.get('IMAGE_CACHE_BYTES', 512 * 2 ** 20))
+
+
+class ImageCache:
+    """Byte-budgeted LRU cache of read-only decoded images."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def imread(self, path, flags=cv2.IMREAD_COLOR):
+        """
+        Drop-in replacement for cv2.imread that serves repeated reads from memory.
+
+        :return: Read-only view of the cached array, or None if the file is missing or cannot be decoded.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        location = (os.path.abspath(path), flags)
+        key = location + (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            img = self._entries.get(key)
+            if img is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return img.view()
+            self.misses += 1
+
+        # decode outside the lock so other threads keep getting hits meanwhile
+        img = cv2.imread(path, flags)
+        if img is None:
+            return None
+        img.flags.writeable = False
+        if img.nbytes > self.max_bytes:
+            return img
+        with self._lock:
+            # an older version of the same file can never be hit again
+            for stale in [k for k in self._entries if k[:2] == location and k != key]:
+                self._remove(stale)
+            if key not in self._entries:
+                self._entries[key] = img
+                self.bytes += img.nbytes
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return img.view()
+
+    def stats(self):
+        """Hit/miss/eviction counters and the current size of the cache."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def _remove(self, key):
+        self.bytes -= self._entries.pop(key).nbytes
+
+
+default_cache = ImageCache()
+
+
+def imread(path, flags=cv2.IMREAD_COLOR):
+    """cv2.imread through the process-wide cache, see ImageCache.imread."""
+    return default_cache.imread(path, flags)
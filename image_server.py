@@ -0,0 +1,321 @@
+"""
+Local image-processing server, so other programs can use ImageProcessor (2_cv2.py) and
+ImageAnalyzer (3_lab_task2.py) without importing Python/OpenCV for every job.
+
+    python image_server.py --unix /tmp/image_server.sock
+    python image_server.py --host 127.0.0.1 --port 8765 --workers 4
+
+Every message, in both directions, is a 4 byte big-endian header length, a JSON header and
+header['size'] bytes of payload:
+
+    request   {"op": "blur", "params": {"blur_type": "gaussian", "ksize": [5, 5]},
+               "format": ".png", "size": 1234}  + encoded image
+    response  {"status": "ok", "size": 987, "shape": [480, 640, 3]}  + encoded result
+              {"status": "busy", "size": 0}     too many jobs in flight, retry later
+              {"status": "error", "error": "...", "size": 0}
+
+The operations are in OPERATIONS. They run on a process pool (or a thread pool) whose
+workers import the lab modules once. Identical requests (same image bytes, operation,
+parameters and output format) that arrive while one is still being computed share that
+computation. Beyond max_pending distinct jobs new ones are answered 'busy' at once, so
+a burst cannot queue up unbounded work.
+
+    with ImageClient('/tmp/image_server.sock') as client:
+        edges = client.request('edges', img, operator='canny')
+"""
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import hashlib
+import json
+import logging
+import os
+import socket
+import struct
+
+import cv2
+import numpy as np
+
+from artifact_sink import NullSink
+import lab_modules
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS = ('resize', 'blur', 'threshold', 'edges', 'watershed')
+HEADER = struct.Struct('>I')
+MAX_HEADER_BYTES = 64 * 1024
+MAX_REQUEST_BYTES = 256 * 2 ** 20
+
+
+def _init_worker():
+    # every worker already owns a core, and the imports are paid once per worker
+    cv2.setNumThreads(1)
+    lab_modules.load('2_cv2')
+    lab_modules.load('3_lab_task2')
+    # per-call progress messages would flood the server log
+    for name in ('2_cv2', '3_lab_task2', 'artifact_sink'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+
+def _analyzer(img):
+    return lab_modules.load('3_lab_task2').ImageAnalyzer.from_array(img, sink=NullSink())
+
+
+def apply_operation(op, params, img):
+    """
+    Runs one operation on a decoded image and returns the resulting image.
+
+    resize     width and height, or fx and fy; method (see 2_cv2.RESIZE_METHODS)
+    blur       blur_type (see 2_cv2.BLUR_TYPES), ksize
+    threshold  kind: 'global' (fixed threshold 127) or 'adaptive' (Gaussian, 11x11 blocks)
+    edges      operator: 'sobel', 'prewitt', 'roberts' or 'canny'
+    watershed  levels, band (see ImageAnalyzer.watershed_regions); boundaries painted blue
+    """
+    if op not in OPERATIONS:
+        raise ValueError(f"Invalid operation. Choose from {list(OPERATIONS)}.")
+    if op in ('resize', 'blur'):
+        processor = lab_modules.load('2_cv2').ImageProcessor.from_array(img)
+        if op == 'blur':
+            processor.blur_image(params.get('blur_type', 'box'), tuple(params.get('ksize', (13, 13))))
+        elif 'width' in params and 'height' in params:
+            processor.resize_to_dimensions(params['width'], params['height'], params.get('method', 'linear'))
+        elif 'fx' in params and 'fy' in params:
+            processor.resize_by_scale(params['fx'], params['fy'], params.get('method', 'linear'))
+        else:
+            raise ValueError("Resize needs width and height, or fx and fy.")
+        return processor.img
+    analyzer = _analyzer(img)
+    if op == 'threshold':
+        kind = params.get('kind', 'global')
+        if kind not in ('global', 'adaptive'):
+            raise ValueError("Invalid threshold kind. Choose from ['global', 'adaptive'].")
+        return analyzer.global_thresholding() if kind == 'global' else analyzer.adaptive_thresholding()
+    if op == 'edges':
+        operator = params.get('operator', 'canny')
+        return analyzer.edge_maps((operator,))[operator]
+    return analyzer.watershed_segmentation(params.get('levels', 1), params.get('band', 2))
+
+
+def process_request(op, params, data, fmt):
+    """Decode, process and encode one request; runs inside the executor."""
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Could not decode the image")
+    result = apply_operation(op, params, img)
+    ok, encoded = cv2.imencode(fmt, result)
+    if not ok:
+        raise ValueError(f"Could not encode the result as {fmt}")
+    return encoded.tobytes(), list(result.shape)
+
+
+async def _read_message(reader):
+    length, = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if length > MAX_HEADER_BYTES:
+        raise ValueError("Header too large")
+    header = json.loads(await reader.readexactly(length))
+    return header
+
+
+def _encode_message(header, payload=b''):
+    header = dict(header, size=len(payload))
+    raw = json.dumps(header).encode()
+    return HEADER.pack(len(raw)) + raw + payload
+
+
+class ImageServer:
+    """asyncio front end: parses requests, coalesces duplicates, admits or rejects work."""
+
+    def __init__(self, path=None, host='127.0.0.1', port=8765, workers=None, executor='process',
+                 max_pending=64, max_request_bytes=MAX_REQUEST_BYTES):
+        """
+        :param path: Unix socket path; when given host and port are ignored.
+        :param host: Interface to listen on, keep it local, there is no authentication.
+        :param port: TCP port.
+        :param workers: Executor workers (default is the number of cores).
+        :param executor: 'process' (true parallelism, each worker imports the modules once)
+            or 'thread' (no start-up cost, relies on OpenCV releasing the GIL).
+        :param max_pending: Distinct jobs queued or running before new ones get 'busy'.
+        :param max_request_bytes: Largest accepted image payload.
+        """
+        if executor not in ('process', 'thread'):
+            raise ValueError("Invalid executor. Choose from ['process', 'thread'].")
+        self.path = path
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count()
+        self.executor_kind = executor
+        self.max_pending = max_pending
+        self.max_request_bytes = max_request_bytes
+        self.stats = {'requests': 0, 'coalesced': 0, 'busy': 0, 'errors': 0}
+        self._inflight = {}
+        self._executor = None
+        self._server = None
+
+    async def start(self):
+        if self.executor_kind == 'process':
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        else:
+            _init_worker()
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        if self.path is not None:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+            logger.info("Serving on %s", self.path)
+        else:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+            self.port = self._server.sockets[0].getsockname()[1]
+            logger.info("Serving on %s:%d", self.host, self.port)
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self.path is not None and os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    header = await _read_message(reader)
+                except asyncio.IncompleteReadError:
+                    break  # client closed the connection
+                size = int(header.get('size', 0))
+                if size > self.max_request_bytes:
+                    # the payload cannot be skipped safely, drop the connection
+                    writer.write(_encode_message({'status': 'error', 'error': "Request too large"}))
+                    break
+                data = await reader.readexactly(size)
+                writer.write(await self._respond(header, data))
+                await writer.drain()
+        except (ConnectionError, ValueError) as e:
+            logger.error("Connection error: %s", e)
+        finally:
+            writer.close()
+
+    async def _respond(self, header, data):
+        self.stats['requests'] += 1
+        op, params = header.get('op'), header.get('params') or {}
+        fmt = header.get('format', '.png')
+        if op not in OPERATIONS:
+            self.stats['errors'] += 1
+            return _encode_message({'status': 'error', 'error': f"Invalid operation. Choose from {list(OPERATIONS)}."})
+        key = hashlib.sha256(data)
+        key.update(json.dumps([op, params, fmt], sort_keys=True).encode())
+        key = key.digest()
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats['coalesced'] += 1
+        elif len(self._inflight) >= self.max_pending:
+            self.stats['busy'] += 1
+            return _encode_message({'status': 'busy'})
+        else:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, process_request, op, params, data, fmt)
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        try:
+            # shield: one client disconnecting must not cancel the job other clients share
+            payload, shape = await asyncio.shield(future)
+        except Exception as e:
+            self.stats['errors'] += 1
+            return _encode_message({'status': 'error', 'error': str(e)})
+        return _encode_message({'status': 'ok', 'shape': shape}, payload)
+
+
+class ServerBusyError(RuntimeError):
+    """The server refused the job because too many are in flight; retry later."""
+
+
+class ImageClient:
+    """Blocking client for ImageServer, one persistent connection."""
+
+    def __init__(self, path=None, host='127.0.0.1', port=8765, timeout=60):
+        """
+        :param path: Unix socket path of the server, or None to connect to host and port.
+        :param timeout: Seconds to wait for a response.
+        """
+        if path is not None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(timeout)
+            self.sock.connect(path)
+        else:
+            self.sock = socket.create_connection((host, port), timeout=timeout)
+
+    def request(self, op, image, fmt='.png', **params):
+        """
+        Runs one operation on the server.
+
+        :param op: One of OPERATIONS.
+        :param image: Decoded image array (sent losslessly as PNG) or already encoded bytes.
+        :param fmt: Extension of the format the result is sent back in.
+        :param params: Parameters of the operation, see apply_operation.
+        :return: The decoded result image.
+        """
+        if isinstance(image, np.ndarray):
+            ok, encoded = cv2.imencode('.png', image)
+            if not ok:
+                raise ValueError("Could not encode the image")
+            image = encoded.tobytes()
+        self.sock.sendall(_encode_message({'op': op, 'params': params, 'format': fmt}, image))
+        header = json.loads(self._receive(HEADER.unpack(self._receive(HEADER.size))[0]))
+        payload = self._receive(header.get('size', 0))
+        if header['status'] == 'busy':
+            raise ServerBusyError("Server busy, retry later")
+        if header['status'] != 'ok':
+            raise RuntimeError(f"Server error: {header.get('error')}")
+        return cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_UNCHANGED)
+
+    def _receive(self, size):
+        chunks, remaining = [], size
+        while remaining:
+            chunk = self.sock.recv(min(remaining, 1 << 20))
+            if not chunk:
+                raise ConnectionError("Server closed the connection")
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b''.join(chunks)
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--unix', help="Unix socket path (instead of host/port)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--executor', choices=('process', 'thread'), default='process')
+    parser.add_argument('--max-pending', type=int, default=64)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    server = ImageServer(args.unix, args.host, args.port, args.workers, args.executor, args.max_pending)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import cv2
+
+
+def encoder_params(output_path, quality=None, png_compression=None, progressive=False):
+    """
+    Build the cv2.imwrite/imencode parameter list for the format of output_path.
+
+    :param output_path: File name or extension ('.jpg', '.png', '.webp', ...).
+    :param quality: JPEG or WebP quality, 0-100 (WebP above 100 is lossless).
+    :param png_compression: PNG compression level, 0 (fast, big) to 9 (slow, small).
+    :param progressive: Write progressive JPEGs.
+    :return: Flat list of ints as expected by OpenCV.
+    """
+    ext = os.path.splitext(output_path)[1].lower() or output_path.lower()
+    params = []
+    if ext in ('.jpg', '.jpeg'):
+        if quality is not None:
+            params += [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)]
+        if progressive:
+            params += [int(cv2.IMWRITE_JPEG_PROGRESSIVE), 1]
+    elif ext == '.png':
+        if png_compression is not None:
+            params += [int(cv2.IMWRITE_PNG_COMPRESSION), int(png_compression)]
+    elif ext == '.webp':
+        if quality is not None:
+            params += [int(cv2.IMWRITE_WEBP_QUALITY), int(quality)]
+    return params
+
+
+class ImageWriter:
+    """
+    Encodes and writes images on a pool of background threads.
+
+    submit() returns as soon as the image is queued, so the caller never waits on the
+    encoder or the filesystem unless max_pending writes are already queued (backpressure).
+    flush() is the barrier: it blocks until everything submitted so far is on disk and
+    re-raises the first failure. Files are written to a temporary name and renamed, so
+    readers never see half-written images.
+
+    The image passed to submit() must not be modified until its write has finished,
+    pass copy=True when the caller keeps working on the same array.
+
+    Example:
+        with ImageWriter() as writer:
+            writer.submit('edited_images/out.jpg', img, encoder_params('.jpg', quality=90))
+    """
+
+    def __init__(self, max_workers=2, max_pending=16):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-writer')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._errors = []
+
+    def submit(self, output_path, img, params=None, copy=False):
+        """
+        Queue an image for writing.
+
+        :param output_path: Destination file, its extension selects the encoder.
+        :param img: Image array.
+        :param params: Encoder parameters, see encoder_params().
+        :param copy: Copy the image first so the caller may modify it right away.
+        :return: Future resolving to output_path.
+        """
+        if copy:
+            img = img.copy()
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._write, output_path, img, params or [])
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def flush(self):
+        """Block until every submitted image is written, then raise the first error if any."""
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending)
+        with self._lock:
+            errors, self._errors = self._errors, []
+        if errors:
+            raise errors[0]
+
+    def close(self):
+        """Flush and stop the writer threads."""
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _done(self, future):
+        with self._lock:
+            self._pending.discard(future)
+            if future.exception() is not None:
+                self._errors.append(future.exception())
+        self._slots.release()
+
+    @staticmethod
+    def _write(output_path, img, params):
+        ext = os.path.splitext(output_path)[1]
+        ok, encoded = cv2.imencode(ext, img, params)
+        if not ok:
+            raise IOError(f"Could not encode {output_path}")
+        tmp_path = f"{output_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(encoded)
+        os.replace(tmp_path, output_path)
+        return output_path
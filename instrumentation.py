@@ -0,0 +1,336 @@
+"""
+Per-operation metrics for ImageProcessor (2_cv2.py, 3_lab.py) and ImageAnalyzer (3_lab_task2.py).
+
+Every method decorated with @instrumented() records, labelled with its module and name:
+
+    image_op_calls_total / image_op_errors_total    counters
+    image_op_bytes_in_total / image_op_bytes_out_total
+                                                    counters of array bytes read and produced
+    image_op_seconds, image_op_cpu_seconds          histograms of wall and thread CPU time
+    image_op_alloc_peak_bytes                       histogram, only after enable(trace_memory=True)
+
+Progress messages the classes used to print go to the logging module instead (logger
+per module, INFO level); the scripts' __main__ blocks configure logging so running them
+prints the same lines as before.
+
+    import instrumentation
+    instrumentation.enable(profile=True, trace_memory=True)   # opt-in, both are slow
+    ...
+    instrumentation.write_prometheus('metrics.prom')   # node_exporter textfile format
+    instrumentation.write_json('metrics.json')
+    print(instrumentation.profile_report())
+
+Set IMAGE_INSTRUMENTATION=0 to turn recording off entirely.
+"""
+import cProfile
+from contextlib import contextmanager
+import functools
+import io
+import json
+import math
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(12))  # 1 KiB .. 4 GiB
+
+enabled = os.environ.get('IMAGE_INSTRUMENTATION', '1') != '0'
+
+
+class Histogram:
+    """Prometheus style histogram: cumulative bucket counts, sum and count."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total, result = 0, []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (0..1), like histogram_quantile."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        for bound, total in zip(self.buckets + (math.inf,), self.cumulative()):
+            if total >= target:
+                return bound
+        return math.inf
+
+
+class Registry:
+    """Thread-safe set of labelled counters and histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=SECONDS_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def to_prometheus(self):
+        """Text exposition format, one TYPE line per metric family."""
+        lines, typed = [], set()
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                bounds = [repr(float(b)) for b in histogram.buckets] + ['+Inf']
+                for bound, total in zip(bounds, histogram.cumulative()):
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {total}")
+                lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def to_dict(self):
+        """Counters and histogram summaries (count, sum, mean, p50/p95/p99 bucket bounds)."""
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            histograms = []
+            for (name, labels), h in sorted(self.histograms.items()):
+                histograms.append({
+                    'name': name,
+                    'labels': dict(labels),
+                    'count': h.count,
+                    'sum': h.sum,
+                    'mean': h.sum / h.count if h.count else 0.0,
+                    'p50': h.quantile(0.5),
+                    'p95': h.quantile(0.95),
+                    'p99': h.quantile(0.99),
+                    'buckets': dict(zip([str(b) for b in h.buckets] + ['+Inf'], h.cumulative())),
+                })
+        return {'counters': counters, 'histograms': histograms}
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+registry = Registry()
+
+_profile = False
+# only peaks of a tracemalloc session started here are recorded, reset_peak() would
+# disturb anyone else measuring with tracemalloc (e.g. benchmark.py)
+_trace_memory = False
+_local = threading.local()
+_profilers = []
+_profilers_lock = threading.Lock()
+
+
+def enable(profile=False, trace_memory=False):
+    """
+    Opt-in extras on top of the always-on counters.
+
+    :param profile: Run the outermost instrumented call of every thread under cProfile,
+        see profile_report() and dump_profile().
+    :param trace_memory: Start tracemalloc so image_op_alloc_peak_bytes is recorded. Peaks
+        of operations running at the same time on several threads include each other.
+    """
+    global _profile, _trace_memory
+    _profile = profile
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _trace_memory = True
+
+
+def disable():
+    global _profile, _trace_memory
+    _profile = False
+    if _trace_memory:
+        tracemalloc.stop()
+        _trace_memory = False
+
+
+def _thread_profiler():
+    profiler = getattr(_local, 'profiler', None)
+    if profiler is None:
+        profiler = _local.profiler = cProfile.Profile()
+        with _profilers_lock:
+            _profilers.append(profiler)
+    return profiler
+
+
+def _merged_stats():
+    with _profilers_lock:
+        profilers = list(_profilers)
+    if not profilers:
+        return None
+    stats = pstats.Stats(profilers[0])
+    for profiler in profilers[1:]:
+        stats.add(profiler)
+    return stats
+
+
+def profile_report(limit=25, sort='cumulative'):
+    """The merged cProfile statistics of all threads as text."""
+    stats = _merged_stats()
+    if stats is None:
+        return "No profile recorded. Call enable(profile=True) first."
+    stats.stream = io.StringIO()
+    stats.sort_stats(sort).print_stats(limit)
+    return stats.stream.getvalue()
+
+
+def dump_profile(path):
+    """Writes the merged cProfile statistics for pstats/snakeviz."""
+    stats = _merged_stats()
+    if stats is None:
+        raise ValueError("No profile recorded. Call enable(profile=True) first.")
+    stats.dump_stats(path)
+
+
+def array_bytes(value):
+    """Bytes of the numpy arrays in value (an array, or a tuple/list/dict of them)."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(array_bytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(array_bytes(v) for v in value.values())
+    return 0
+
+
+class _Span:
+    def __init__(self):
+        self.bytes_out = 0
+
+
+@contextmanager
+def operation(name, module='', bytes_in=0):
+    """
+    Records one operation; set span.bytes_out inside the block.
+
+        with operation('decode', 'my_module', len(buffer)) as span:
+            img = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+            span.bytes_out = img.nbytes
+    """
+    span = _Span()
+    if not enabled:
+        yield span
+        return
+    labels = {'module': module, 'op': name}
+    depth = getattr(_local, 'depth', 0)
+    profiler = _thread_profiler() if _profile and depth == 0 else None
+    tracing = _trace_memory and tracemalloc.is_tracing()
+    if tracing:
+        before = tracemalloc.get_traced_memory()[0]
+        if depth == 0:
+            tracemalloc.reset_peak()
+    _local.depth = depth + 1
+    if profiler is not None:
+        profiler.enable()
+    wall, cpu = time.perf_counter(), time.thread_time()
+    failed = False
+    try:
+        yield span
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+        if profiler is not None:
+            profiler.disable()
+        _local.depth = depth
+        registry.inc('image_op_calls_total', **labels)
+        if failed:
+            registry.inc('image_op_errors_total', **labels)
+        registry.inc('image_op_bytes_in_total', bytes_in, **labels)
+        registry.inc('image_op_bytes_out_total', span.bytes_out, **labels)
+        registry.observe('image_op_seconds', wall, **labels)
+        registry.observe('image_op_cpu_seconds', cpu, **labels)
+        if tracing and tracemalloc.is_tracing():
+            peak = max(tracemalloc.get_traced_memory()[1] - before, 0)
+            registry.observe('image_op_alloc_peak_bytes', peak, BYTES_BUCKETS, **labels)
+
+
+def instrumented(state=None):
+    """
+    Decorator recording a method as an operation (see operation()).
+
+    Bytes in are the arrays among the arguments plus the `state` attribute of self (e.g.
+    'img') before the call; bytes out are the arrays returned or, when the method returns
+    none, the state attribute after the call.
+    """
+    def decorate(func):
+        name = func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if not enabled:
+                return func(self, *args, **kwargs)
+            bytes_in = array_bytes(args) + array_bytes(kwargs)
+            if state is not None:
+                bytes_in += array_bytes(getattr(self, state, None))
+            with operation(name, func.__module__, bytes_in) as span:
+                result = func(self, *args, **kwargs)
+                span.bytes_out = array_bytes(result)
+                if not span.bytes_out and state is not None:
+                    span.bytes_out = array_bytes(getattr(self, state, None))
+            return result
+        return wrapper
+    return decorate
+
+
+def _write_atomic(path, text):
+    # readers such as node_exporter's textfile collector must never see half a file
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+
+def write_prometheus(path):
+    """Exports the registry in Prometheus text format."""
+    _write_atomic(path, registry.to_prometheus())
+
+
+def write_json(path):
+    """Exports the registry as JSON, see Registry.to_dict()."""
+    _write_atomic(path, json.dumps(registry.to_dict(), indent=2))
@@ -0,0 +1,15 @@
+"""
+Imports the numbered lab scripts (1_cv2CanvasShape.py, 2_cv2.py, 3_lab.py, 3_lab_task2.py)
+for the tools built around them.
+
+The script names start with a digit, so `import 2_cv2` is a syntax error and they can only
+be imported through importlib:
+
+    ImageProcessor = lab_modules.load('2_cv2').ImageProcessor
+"""
+import importlib
+
+
+def load(module_name):
+    """The imported module; importlib keeps it in sys.modules, so repeated calls are cheap."""
+    return importlib.import_module(module_name)
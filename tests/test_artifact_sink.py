@@ -0,0 +1,25 @@
+import threading
+
+import cv2
+import numpy as np
+
+from artifact_sink import AsyncDiskSink
+
+
+def test_async_sink_writes_the_image_as_it_was_queued(tmp_path, monkeypatch):
+    # hold the encoder until the caller has modified its array
+    release = threading.Event()
+    imencode = cv2.imencode
+
+    def held_imencode(*args):
+        release.wait(5)
+        return imencode(*args)
+
+    monkeypatch.setattr(cv2, 'imencode', held_imencode)
+    image = np.full((20, 30, 3), 100, np.uint8)
+    sink = AsyncDiskSink(str(tmp_path))
+    future = sink.write('out.png', image)
+    image[:] = 0
+    release.set()
+    sink.close()
+    assert (cv2.imread(future.result()) == 100).all()
@@ -0,0 +1,43 @@
+import benchmark
+
+
+def record(p50):
+    return {'p50_ms': p50}
+
+
+BASELINE = {
+    'processor.blur_box/256/uint8/3': record(1.0),
+    'processor.blur_box/1024/uint8/3': record(10.0),
+    'analyzer.sobel_operator/256/uint8/3': record(2.0),
+    'processor.blur_box/256/float32/4': {'skipped': "unsupported"},
+}
+
+
+def test_slower_case_is_a_regression():
+    results = dict(BASELINE, **{'processor.blur_box/256/uint8/3': record(1.5)})
+    regressions, missing = benchmark.compare(results, BASELINE, 0.25)
+    assert regressions == [('processor.blur_box/256/uint8/3', 1.0, 1.5)]
+    assert missing == []
+
+
+def test_skipped_or_vanished_case_fails():
+    results = {
+        'processor.blur_box/256/uint8/3': {'skipped': "cv2.error"},
+        'processor.blur_box/1024/uint8/3': record(10.0),
+    }
+    regressions, missing = benchmark.compare(results, BASELINE, 0.25)
+    assert regressions == []
+    assert missing == [('analyzer.sobel_operator/256/uint8/3', "no such case any more"),
+                       ('processor.blur_box/256/uint8/3', "cv2.error")]
+
+
+def test_cases_outside_the_run_are_not_expected():
+    results = {'processor.blur_box/256/uint8/3': record(1.0)}
+    assert benchmark.compare(results, BASELINE, 0.25, sizes=[256], name_filter='processor') == ([], [])
+
+
+def test_every_new_operation_has_a_case():
+    names = {name for name, _, _ in benchmark.all_cases()}
+    assert {'perform.add_remove_shapes', 'perform.render_full', 'perform.render_incremental',
+            'transform_stack.apply', 'transform_stack.redraw', 'processor.pipeline_run',
+            'processor.thumbnail', 'analyzer.tiled_sobel'} <= names
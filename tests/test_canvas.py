@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+import lab_modules
+
+canvas = lab_modules.load('1_cv2CanvasShape')
+
+WIDTH, HEIGHT, COUNT = 400, 300, 50
+
+
+@pytest.mark.parametrize('thickness', [-1, 2])
+@pytest.mark.parametrize('shape_type', ['rectangle', 'square'])
+def test_render_matches_make_shape(shape_type, thickness):
+    # random, overlapping boxes, some partly off the canvas
+    corners = np.random.default_rng(0).integers(-20, max(WIDTH, HEIGHT) + 20, (COUNT, 4))
+    boxes = np.column_stack([np.minimum(corners[:, 0], corners[:, 1]), np.minimum(corners[:, 2], corners[:, 3]),
+                             np.maximum(corners[:, 0], corners[:, 1]), np.maximum(corners[:, 2], corners[:, 3])])
+    listed = canvas.Perform(WIDTH, HEIGHT)
+    ids = listed.add_shapes(boxes, shape_type, (0, 200, 100), thickness)
+    for kept in (slice(None), slice(COUNT // 5, None)):
+        if kept.start:
+            listed.remove_shapes(ids[:kept.start])
+        listed.render()
+        drawn = canvas.Perform(WIDTH, HEIGHT)
+        for startX, startY, endX, endY in boxes[kept].tolist():
+            drawn.make_shape(startX, startY, endX, endY, shape_type, (0, 200, 100), thickness)
+        assert np.array_equal(listed.blank, drawn.blank)
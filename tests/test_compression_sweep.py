@@ -0,0 +1,31 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from compression_sweep import CompressionSweep
+
+IMAGE = cv2.imread(os.path.join(os.path.dirname(__file__), os.pardir, 'images', 'img.png'))
+
+
+@pytest.mark.parametrize('image', [
+    IMAGE,
+    IMAGE.astype(np.uint16) * 257,
+    IMAGE.astype(np.float32) / 255,
+], ids=['uint8', 'uint16', 'float32'])
+@pytest.mark.parametrize('fmt', ['jpeg', 'webp'])
+def test_8bit_formats_measure_the_scaled_image(image, fmt):
+    result = CompressionSweep(image, workers=1).encode(fmt, 90)
+    assert result['psnr'] > 30
+    assert result['ssim'] > 0.9
+
+
+def test_png_keeps_16_bits_lossless():
+    image = IMAGE.astype(np.uint16) * 257 + 3
+    assert CompressionSweep(image, workers=1).encode('png', 3)['psnr'] == float('inf')
+
+
+def test_jpeg_drops_alpha_without_failing():
+    bgra = cv2.cvtColor(IMAGE, cv2.COLOR_BGR2BGRA)
+    assert CompressionSweep(bgra, workers=1).encode('jpeg', 90)['psnr'] > 0
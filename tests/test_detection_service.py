@@ -0,0 +1,46 @@
+import threading
+import time
+
+import numpy as np
+
+from detection_service import DetectionService
+
+
+class StubService(DetectionService):
+    """Serves a stub model without torch: every image gets its mean as its only score."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.running = threading.Event()
+        self.release = threading.Event()
+
+    def start(self, warmup=False):
+        self._started = time.perf_counter()
+        self._worker = threading.Thread(target=self._serve, daemon=True)
+        self._worker.start()
+        return self
+
+    def _infer(self, images):
+        self.running.set()
+        self.release.wait(5)
+        return [{'scores': np.array([image.mean()])} for image in images]
+
+
+def image(value):
+    return np.full((8, 8, 3), value, np.uint8)
+
+
+def test_cancelled_requests_do_not_stop_the_worker():
+    service = StubService(max_batch_size=1, max_wait=0).start()
+    first = service.submit(image(1))
+    assert service.running.wait(5)
+    # queued behind the running batch, so these can still be cancelled
+    queued = [service.submit(image(value)) for value in (2, 3, 4)]
+    assert queued[0].cancel() and queued[2].cancel()
+    service.release.set()
+    assert first.result(5)['scores'][0] == 1
+    assert queued[1].result(5)['scores'][0] == 3
+    assert service._worker.is_alive()
+    assert service.detect(image(5), timeout=5)['scores'][0] == 5
+    service.stop()
+    assert service.metrics()['completed'] == 3
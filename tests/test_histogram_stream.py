@@ -0,0 +1,32 @@
+import cv2
+import numpy as np
+import pytest
+
+from histogram_stream import HistogramAccumulator, image_histogram
+
+
+def reference(img, bins):
+    # analyze_histogram of 4_lab.ipynb: one calcHist per channel, then the luminance
+    channels = [img] if img.ndim == 2 else list(cv2.split(img))
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY if img.shape[2] == 3 else cv2.COLOR_BGRA2GRAY)
+    return np.array([cv2.calcHist([c], [0], None, [bins], [0, 256]).ravel() for c in channels + [gray]], np.int64)
+
+
+@pytest.mark.parametrize('channels', [1, 3, 4])
+@pytest.mark.parametrize('bins', [256, 100])
+def test_matches_per_channel_calc_hist(channels, bins):
+    rng = np.random.default_rng(channels)
+    shape = (301, 257) if channels == 1 else (301, 257, channels)
+    img = rng.integers(0, 256, shape, dtype=np.uint8)
+    # a small chunk size so several chunks, and a short last one, are exercised
+    assert np.array_equal(image_histogram(img, bins, chunk_bytes=4096), reference(img, bins))
+
+
+def test_tiles_merge_to_the_whole_image():
+    img = np.random.default_rng(0).integers(0, 256, (200, 120, 3), dtype=np.uint8)
+    top, bottom = HistogramAccumulator(), HistogramAccumulator()
+    top.update(img[:70])
+    bottom.update(img[70:])
+    top += bottom
+    assert np.array_equal(top.counts, image_histogram(img))
+    assert top.frames == 2
@@ -0,0 +1,42 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+from scipy.ndimage import gaussian_filter
+
+import lab_modules
+
+cv2_lab = lab_modules.load('2_cv2')
+
+IMAGE = cv2.imread(os.path.join(os.path.dirname(__file__), os.pardir, 'images', 'img.png'))
+
+
+def reference(img, sigma):
+    sigma = (sigma[1], sigma[0]) + (0,) * (img.ndim - 2)
+    return gaussian_filter(img.astype(np.float64), sigma, mode='nearest', truncate=8)
+
+
+# Young & van Vliet is itself an approximation, coarser at small sigma
+@pytest.mark.parametrize('sigma, tolerance', [((2, 2), 7.5), ((16.7, 16.7), 3.5), ((2, 9), 7.5)])
+def test_matches_gaussian_filter_with_replicated_borders(sigma, tolerance):
+    error = np.abs(cv2_lab.iir_gaussian_blur(IMAGE, sigma) - reference(IMAGE, sigma))
+    assert error.max() <= tolerance
+    for border in (error[:20], error[-20:], error[:, :20], error[:, -20:]):
+        assert border.max() <= tolerance
+
+
+def test_step_at_the_far_edges():
+    # the anti-causal pass starts there, so a wrong initial state shows up as a dark border
+    img = np.zeros((120, 140), np.uint8)
+    img[:, -5:] = 255
+    img[-5:] = 255
+    error = np.abs(cv2_lab.iir_gaussian_blur(img, (6, 6)) - reference(img, (6, 6)))
+    assert error.max() <= 7.5
+    assert error[-5:].max() <= 2 and error[:, -5:].max() <= 2
+
+
+def test_writes_into_dst_and_skips_tiny_sigma():
+    dst = np.empty_like(IMAGE)
+    assert cv2_lab.iir_gaussian_blur(IMAGE, (0, 0), dst=dst) is dst
+    assert np.array_equal(dst, IMAGE)
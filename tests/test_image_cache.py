@@ -0,0 +1,31 @@
+import cv2
+import numpy as np
+import pytest
+
+from image_cache import ImageCache
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / 'img.png')
+    cv2.imwrite(path, np.arange(24 * 32 * 3, dtype=np.uint8).reshape(24, 32, 3))
+    return path
+
+
+def test_reads_are_read_only_views_of_one_array(path):
+    cache = ImageCache()
+    first, second = cache.imread(path), cache.imread(path)
+    assert first is not second
+    assert first.base is second.base
+    assert cache.stats()['hits'] == 1
+
+
+def test_views_cannot_be_made_writable(path):
+    cache = ImageCache()
+    for img in (cache.imread(path), cache.imread(path)):
+        with pytest.raises(ValueError):
+            img.flags.writeable = True
+        with pytest.raises(ValueError):
+            img[0, 0] = 0
+    assert np.array_equal(cache.imread(path), cv2.imread(path))
+
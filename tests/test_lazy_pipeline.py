@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+import lab_modules
+
+cv2_lab = lab_modules.load('2_cv2')
+
+
+def checkerboard(size=800, square=1):
+    y, x = np.indices((size, size))
+    return np.where((x // square + y // square) % 2, 255, 0).astype(np.uint8)
+
+
+def eager(img, steps):
+    processor = cv2_lab.ImageProcessor.from_array(img.copy())
+    for name, args in steps:
+        getattr(processor, name)(*args)
+    return processor.img
+
+
+def record(img, steps):
+    pipeline = cv2_lab.ImageProcessor.from_array(img.copy()).pipeline()
+    for name, args in steps:
+        getattr(pipeline, name)(*args)
+    return pipeline
+
+
+@pytest.mark.parametrize('first', ['area', 'auto'])
+def test_merged_resize_keeps_area_low_pass(first):
+    # a fine checkerboard averages to flat grey; a merged linear downscale would alias
+    img = checkerboard()
+    steps = [('resize_by_scale', (0.1, 0.1, first)), ('resize_to_dimensions', (60, 60))]
+    expected, result = eager(img, steps), record(img, steps).run()
+    assert result.shape == expected.shape == (60, 60)
+    assert result.std() < 2
+    assert np.abs(result.astype(int) - expected).max() <= 2
+
+
+def test_linear_resizes_still_merge():
+    img = checkerboard(200, square=20)
+    steps = [('resize_by_scale', (0.5, 0.5, 'linear')), ('resize_to_dimensions', (60, 60))]
+    assert record(img, steps).plan() == [('resize', (60, 60), cv2_lab.INTERPOLATION_METHODS['linear'])]
+
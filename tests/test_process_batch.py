@@ -0,0 +1,42 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+import lab_modules
+
+cv2_lab = lab_modules.load('2_cv2')
+
+OPERATIONS = [('resize_to_dimensions', {'width': 16, 'height': 16})]
+
+
+@pytest.fixture
+def source(tmp_path):
+    # the same file name in two directories
+    for name, value in (('a', 50), ('b', 200)):
+        os.makedirs(tmp_path / 'in' / name)
+        cv2.imwrite(str(tmp_path / 'in' / name / 'x.png'), np.full((32, 24, 3), value, np.uint8))
+    return tmp_path / 'in'
+
+
+@pytest.mark.parametrize('listed', [False, True], ids=['glob', 'list'])
+def test_same_names_keep_their_relative_paths(source, tmp_path, listed):
+    output_dir = str(tmp_path / 'out')
+    batch_source = os.path.join(str(source), '**', '*.png')
+    if listed:
+        batch_source = [str(source / 'a' / 'x.png'), str(source / 'b' / 'x.png')]
+    results = cv2_lab.process_batch(batch_source, OPERATIONS, output_dir, workers=1)
+    assert sorted(output for _, output, _ in results) == [os.path.join(output_dir, 'a', 'x.png'),
+                                                         os.path.join(output_dir, 'b', 'x.png')]
+    for name, value in (('a', 50), ('b', 200)):
+        written = cv2.imread(os.path.join(output_dir, name, 'x.png'))
+        assert written.shape == (16, 16, 3) and (written == value).all()
+
+
+def test_colliding_outputs_raise_before_processing(source, tmp_path):
+    path = str(source / 'a' / 'x.png')
+    output_dir = tmp_path / 'out'
+    with pytest.raises(ValueError):
+        cv2_lab.process_batch([path, path], OPERATIONS, str(output_dir), workers=1)
+    assert not output_dir.exists() or not any(output_dir.iterdir())